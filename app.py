@@ -1,11 +1,16 @@
-import math
-import io
 from typing import Dict, Any, Optional
 
 import streamlit as st
-import requests
-import pandas as pd
-from PIL import Image
+
+from utils.lazy import lazy_import
+from utils.financing import DEFAULT_PRODUCTS, build_product_catalog, evaluate_financing
+from utils.deal_rules import DEFAULT_RULES, RuleError, compile_rules, screen_feed
+from utils.reports import deals_from_snapshots, render_batch, render_deal_report
+from utils.storage import list_snapshots
+from utils.market_series import get_market_store
+
+# Heavy modules load on first use: pandas on calculate / screening
+pd = lazy_import("pandas")
 
 # -------------------------------------------------
 # CONFIG
@@ -61,6 +66,8 @@ def brrrr_core_calc(
     mgmt_pct: float,
     refi_rate: float,
     refi_years: int,
+    appreciation_pct: float = 0.0,
+    rent_growth_pct: float = 0.0,
 ) -> Dict[str, Any]:
     total_cash_in = purchase + rehab + closing_buy
     loan_amount = arv * (ltv / 100.0)
@@ -93,6 +100,17 @@ def brrrr_core_calc(
     one_percent_required_rent = purchase * 0.01
     one_percent_ratio = (rent_monthly / purchase * 100.0) if purchase > 0 else 0
 
+    # Year-2 projection from market growth (מגמות שוק)
+    arv_12m = arv * (1 + appreciation_pct / 100.0)
+    rent_monthly_12m = rent_monthly * (1 + rent_growth_pct / 100.0)
+    annual_rent_12m = rent_monthly_12m * 12
+    noi_12m = annual_rent_12m - (
+        tax_annual
+        + insurance_annual
+        + annual_rent_12m * ((maintenance_pct + vacancy_pct + mgmt_pct) / 100.0)
+    )
+    cashflow_monthly_12m = (noi_12m - annual_debt_service) / 12
+
     return {
         "total_cash_in": total_cash_in,
         "loan_amount": loan_amount,
@@ -107,6 +125,10 @@ def brrrr_core_calc(
         "one_percent_ratio": one_percent_ratio,
         "monthly_mortgage": monthly_payment,
         "annual_debt_service": annual_debt_service,
+        "arv_12m": arv_12m,
+        "equity_12m": arv_12m - loan_amount,
+        "rent_monthly_12m": rent_monthly_12m,
+        "cashflow_monthly_12m": cashflow_monthly_12m,
     }
 
 
@@ -151,15 +173,16 @@ def estimate_rehab_from_image(uploaded_image: Optional[bytes]) -> Dict[str, Any]
     }
 
 
-def fetch_neighborhood_scores_stub() -> Dict[str, Any]:
+def fetch_neighborhood_scores_stub(economic_trend: Optional[str] = None) -> Dict[str, Any]:
     """
     כאן ייכנסו בעתיד FBI / Census / וכו'.
     כרגע – ערכים דמיוניים לשם הדגמה בלבד.
+    המגמה הכלכלית מגיעה ממאגר מדדי השוק המקומי (data/market) אם יש נתונים.
     """
     return {
         "crime_score": 6.5,  # 1-10 נמוך טוב, גבוהה רע (להגדרה)
         "socio_econ": 7.2,
-        "economic_trend": "Stable",
+        "economic_trend": economic_trend or "Stable",
     }
 
 
@@ -244,6 +267,8 @@ with col_img_1:
     uploaded_file = st.file_uploader("בחר תמונה (חזית / פנים הנכס)", type=["jpg", "jpeg", "png"])
     rehab_auto_est = None
     if uploaded_file is not None:
+        from PIL import Image  # only needed once an image was uploaded
+
         image = Image.open(uploaded_file)
         st.image(image, caption="תצוגת תמונת הנכס", use_column_width=True)
         rehab_auto = estimate_rehab_from_image(uploaded_file.getvalue())
@@ -334,6 +359,39 @@ with col_r3:
     else:
         st.warning("השכירות נמוכה מכלל 1% – בדוק שוב את העסקה / המחיר.")
 
+# Growth assumptions from the local market index store (zip first, then market)
+market_store = get_market_store()
+market_key = next(
+    (k for k in (property_data.get("zip"), market) if k and market_store.has(k)),
+    None,
+)
+price_growth = market_store.growth_rate(market_key, 12, "price") if market_key else None
+rent_growth = market_store.growth_rate(market_key, 12, "rent") if market_key else None
+
+col_g1, col_g2 = st.columns(2)
+with col_g1:
+    appreciation_pct = st.number_input(
+        "צמיחת ערך שנתית (%)",
+        value=round(float(price_growth or 0.0), 2),
+        step=0.25,
+    )
+with col_g2:
+    rent_growth_pct = st.number_input(
+        "צמיחת שכירות שנתית (%)",
+        value=round(float(rent_growth or 0.0), 2),
+        step=0.25,
+    )
+if market_key:
+    st.caption(f"ברירת מחדל לפי מדדי שוק: {market_key} (עד {market_store.latest_month(market_key)})")
+else:
+    st.caption("אין מדדי שוק מקומיים לשוק הזה (data/market) – הנחת צמיחה 0%.")
+
+catalog_file = st.file_uploader(
+    "קטלוג מוצרי מימון (CSV, אופציונלי – ברירת מחדל: מוצרים לדוגמה)",
+    type=["csv"],
+    key="financing_catalog",
+)
+
 close_box()
 
 # ----- NEIGHBORHOOD & SCHOOLS (STUB) ------------------------------------
@@ -341,7 +399,7 @@ cols_top = st.columns(2)
 
 with cols_top[0]:
     section_box("דירוג שכונה (דמו – להמשך פיתוח)", "🏙️")
-    neigh = fetch_neighborhood_scores_stub()
+    neigh = fetch_neighborhood_scores_stub(market_store.trend_label(market_key) if market_key else None)
     st.markdown(
         f"""
         • **דירוג פשיעה (1-10, נמוך טוב):** {neigh['crime_score']:.1f}  
@@ -381,6 +439,8 @@ if calc_clicked:
         mgmt_pct=mgmt_pct,
         refi_rate=refi_rate,
         refi_years=int(refi_years),
+        appreciation_pct=appreciation_pct,
+        rent_growth_pct=rent_growth_pct,
     )
 
     st.markdown("---")
@@ -409,6 +469,10 @@ if calc_clicked:
                 "1% Rule Ratio %",
                 "Monthly Mortgage Payment",
                 "Annual Debt Service",
+                "ARV בעוד 12 חודשים",
+                "Equity בעוד 12 חודשים",
+                "שכירות חודשית בעוד 12 חודשים",
+                "Monthly Cashflow בעוד 12 חודשים",
             ],
             "ערך": [
                 results["total_cash_in"],
@@ -424,11 +488,164 @@ if calc_clicked:
                 results["one_percent_ratio"],
                 results["monthly_mortgage"],
                 results["annual_debt_service"],
+                results["arv_12m"],
+                results["equity_12m"],
+                results["rent_monthly_12m"],
+                results["cashflow_monthly_12m"],
             ],
         }
     )
     st.dataframe(df, use_container_width=True)
 
+    # ----- FINANCING COMPARISON -----------------------------------------
+    st.markdown("### השוואת מוצרי מימון")
+    if catalog_file is not None:
+        catalog = build_product_catalog(pd.read_csv(catalog_file).to_dict("records"))
+    else:
+        catalog = build_product_catalog(DEFAULT_PRODUCTS)
+
+    financing = evaluate_financing(
+        {
+            "purchase": purchase_price,
+            "rehab": rehab_cost,
+            "closing_buy": 0.0,
+            "arv": arv,
+            "rent_monthly": rent_monthly,
+            "tax_annual": tax_annual,
+            "insurance_annual": insurance_annual,
+            "maintenance_pct": maintenance_pct,
+            "vacancy_pct": vacancy_pct,
+            "mgmt_pct": mgmt_pct,
+        },
+        catalog,
+    )
+
+    failed = int((~financing["dscr_ok"]).sum())
+    if failed:
+        st.warning(f"{failed} מוצרים נכשלו בבדיקת DSCR של המלווה.")
+    st.dataframe(financing, use_container_width=True)
+
+    report_html = render_deal_report({
+        "name": address_or_mls or "deal",
+        "snapshot": {
+            "address": property_data.get("address") or address_or_mls,
+            "year_built": int(year_built),
+        },
+        "brrrr": results,
+        "financing": financing,
+    })
+    st.download_button(
+        "📄 הורד דוח עסקה (HTML)",
+        report_html.encode("utf-8"),
+        file_name="deal_report.html",
+        mime="text/html",
+    )
+
+# ----- BATCH DEAL REPORTS -----------------------------------------------
+st.markdown("---")
+section_box("דוחות עסקה מרובים (חבילת מלווים / שותפים)", "🗂️")
+
+report_snapshots = st.multiselect("בחר נכסים שמורים", list_snapshots())
+report_format = st.radio("פורמט", ["html", "pdf"], horizontal=True)
+
+report_arvs: Dict[str, float] = {}
+if report_snapshots:
+    # ARV per property – prefilled from the ARV Analyzer results in this session
+    known_arvs = st.session_state.get("arv_results", {})
+    arv_table = st.data_editor(
+        pd.DataFrame({
+            "snapshot": report_snapshots,
+            "ARV": [known_arvs.get(name) for name in report_snapshots],
+        }),
+        disabled=["snapshot"],
+        hide_index=True,
+        key="report_arvs",
+    )
+    report_arvs = {
+        row["snapshot"]: float(row["ARV"])
+        for row in arv_table.to_dict("records")
+        if pd.notna(row["ARV"]) and float(row["ARV"]) > 0
+    }
+    if len(report_arvs) < len(report_snapshots):
+        st.caption("נכס בלי ARV: הדוח שלו יציג רק מדדים שלא תלויים ב-ARV (בלי הלוואת ריפי, Cash Left In, CoC וכלל 70%).")
+
+if st.button("צור חבילת דוחות") and report_snapshots:
+    with st.spinner("מייצר דוחות…"):
+        deals = deals_from_snapshots(
+            report_snapshots,
+            {
+                "rehab": rehab_cost,
+                "ltv": ltv,
+                "insurance_annual": insurance_annual,
+                "maintenance_pct": maintenance_pct,
+                "vacancy_pct": vacancy_pct,
+                "mgmt_pct": mgmt_pct,
+                "refi_rate": refi_rate,
+                "refi_years": int(refi_years),
+            },
+            arvs=report_arvs,
+        )
+        try:
+            archive = render_batch(deals, fmt=report_format)
+        except RuntimeError as e:
+            st.error(str(e))
+        else:
+            st.download_button(
+                f"⬇️ הורד {len(deals)} דוחות (ZIP)",
+                archive,
+                file_name="deal_packets.zip",
+                mime="application/zip",
+            )
+
+close_box()
+
+# ----- LISTING FEED SCREENING -----------------------------------------
+st.markdown("---")
+section_box("סינון פיד נכסים לפי Buy Box", "🧮")
+
+feed_file = st.file_uploader("פיד נכסים (CSV)", type=["csv"], key="listing_feed")
+buy_box = st.text_area(
+    "כללי Buy Box (שורה לכל כלל, שם: ביטוי)",
+    value="\n".join(f"{name}: {expr}" for name, expr in DEFAULT_RULES.items())
+    + "\nbuy box: coc > 12 and cash_left_in < 15000 and year_built > 1950",
+)
+st.caption("נכס בלי ARV בפיד (עמודת arv / zestimate) לא ייבדק בכללים שתלויים בו (70%, cash_left_in, coc) ולא יעבור.")
+
+if st.button("סנן פיד") and feed_file is not None:
+    rules_text = {}
+    for line in buy_box.splitlines():
+        if ":" in line:
+            name, expr = line.split(":", 1)
+            rules_text[name.strip()] = expr.strip()
+    try:
+        compiled = compile_rules(rules_text)
+        assumptions = {
+            "rehab": rehab_cost,
+            "ltv": ltv,
+            "insurance_annual": insurance_annual,
+            "maintenance_pct": maintenance_pct,
+            "vacancy_pct": vacancy_pct,
+            "mgmt_pct": mgmt_pct,
+            "refi_rate": refi_rate,
+            "refi_years": int(refi_years),
+            "seventy_rule_pct": seventy_rule_base,
+        }
+        passing = list(screen_feed(feed_file, compiled, assumptions))
+    except RuleError as e:
+        st.error(str(e))
+    else:
+        passing_df = pd.concat(passing, ignore_index=True) if passing else pd.DataFrame()
+        st.success(f"{len(passing_df):,} עסקאות עברו את כל הכללים.")
+        if not passing_df.empty:
+            st.dataframe(passing_df, use_container_width=True)
+            st.download_button(
+                "הורד עסקאות שעברו (CSV)",
+                passing_df.to_csv(index=False).encode("utf-8"),
+                file_name="passing_deals.csv",
+            )
+
+close_box()
+
 st.markdown("---")
 st.markdown(
     "<div style='text-align:center;color:#9CA3AF;font-size:12px;margin-top:16px;'>"
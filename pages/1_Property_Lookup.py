@@ -1,5 +1,6 @@
+import re
+
 import streamlit as st
-import pandas as pd
 
 # Zillow auto-scraper
 from utils.zillow_scraper import get_property_data
@@ -117,27 +118,59 @@ st.markdown("---")
 # SAVE SNAPSHOT
 # --------------------------------------------------
 
-from utils.storage import save_property_snapshot
+from utils.storage import save_property_snapshot, snapshot_name
+from utils.snapshot_schema import PropertySnapshot, SnapshotError
+from utils.watchlist import add_to_watchlist
+
+zpid_match = re.search(r"(\d+)_zpid", zillow_url or "")
+watch = st.checkbox(
+    "👀 Add to watchlist (re-check price & rent automatically)",
+    value=False,
+    disabled=zpid_match is None,
+    help="Needs a Zillow URL containing the property's zpid.",
+)
+watch_arv = st.number_input(
+    "ARV for the watchlist buy box ($, optional)",
+    min_value=0.0,
+    step=1000.0,
+    disabled=not watch,
+    help="Without an ARV the 70% rule and cash-left-in rules can't be evaluated for this property.",
+)
 
 if st.button("💾 Create Snapshot"):
     if not address:
         st.error("Please enter at least an address.")
     else:
-        snapshot_data = {
-            "address": address,
-            "mls": mls,
-            "type": property_type,
-            "beds": beds,
-            "baths": baths,
-            "sqft": sqft,
-            "lot_size": lot_sqft,
-            "year_built": year_built,
-            "list_price": list_price,
-            "rent_est": rent_est,
-            "taxes_year": taxes_year,
-            "price_per_sqft": price_per_sqft,
-            "rent_to_price": rent_to_price,
-        }
-
-        filename = save_property_snapshot(address.replace(" ", "_"), snapshot_data)
+        try:
+            snapshot = PropertySnapshot(
+                address=address,
+                mls=mls,
+                type=property_type,
+                beds=beds,
+                baths=baths,
+                sqft=sqft,
+                lot_size=lot_sqft,
+                year_built=int(year_built),
+                list_price=list_price,
+                rent_est=rent_est,
+                taxes_year=taxes_year,
+                price_per_sqft=price_per_sqft,
+                rent_to_price=rent_to_price,
+            )
+            name = snapshot_name(address)
+            filename = save_property_snapshot(name, snapshot, wait=True)
+        except (SnapshotError, OSError) as e:
+            st.error(f"Snapshot not saved: {e}")
+            st.stop()
+
         st.success(f"Snapshot saved successfully! 📁 ({filename})")
+        st.download_button(
+            "⬇️ Export as JSON",
+            snapshot.to_json(),
+            file_name=f"{name}.json",
+            mime="application/json",
+        )
+
+        if watch and zpid_match:
+            add_to_watchlist(name, zpid_match.group(1), arv=watch_arv or None)
+            st.info("Added to watchlist.")
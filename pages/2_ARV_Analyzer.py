@@ -1,18 +1,24 @@
+import re
 import streamlit as st
-import pandas as pd
 from datetime import datetime, timedelta
-import os
+
+from utils.lazy import deferred, lazy_import
+
+pd = lazy_import("pandas")
 
 # Import AI module
 from utils.ask_ai import ASK_AI
 
 # Import snapshot storage helpers
-from utils.storage import list_snapshots, load_snapshot, load_last_snapshot
+from utils.storage import list_snapshots, load_snapshot_record
+from utils.comps_ingest import CompsIngestError, ingest_comps, type_comps
+from utils.reports import render_deal_report
+from utils.market_series import get_market_store
 
 st.set_page_config(layout="wide")
 
 st.title("🏡 ARV & Comps Analyzer")
-st.caption("Analyze ARV based on sold comparable properties (last 12 months, radius up to 0.7 miles).")
+st.caption("Analyze ARV based on sold comparable properties (last 12 months by default, radius up to 0.7 miles).")
 
 st.markdown("---")
 
@@ -28,20 +34,21 @@ selected_snapshot = st.selectbox("📂 Load Property Snapshot", ["-- Select --"]
 
 # Default empty values
 subject_address = ""
-subject_beds = 0
-subject_baths = 0
-subject_sqft = 0
-subject_year = 0
+subject_beds = 0.0
+subject_baths = 0.0
+subject_sqft = 0.0
+subject_year = 1970
 
 if selected_snapshot != "-- Select --":
-    snap = load_snapshot(selected_snapshot)
+    snap = load_snapshot_record(selected_snapshot)
 
-    # Correct field names from Property Lookup
-    subject_address = snap.get("address", "")
-    subject_beds = float(snap.get("beds", 0) or 0)
-    subject_baths = float(snap.get("baths", 0) or 0)
-    subject_sqft = float(snap.get("sqft", 0) or 0)
-    subject_year = int(snap.get("year_built", 0) or 0)
+    # Typed record; old snapshots aren't validated on read, so keep values in the inputs' range
+    subject_address = snap.address
+    subject_beds = max(snap.beds, 0.0)
+    subject_baths = max(snap.baths, 0.0)
+    subject_sqft = max(snap.sqft, 0.0)
+    if 1800 <= snap.year_built <= 2100:
+        subject_year = snap.year_built
 
     st.success(f"Loaded snapshot: {selected_snapshot}")
 
@@ -66,28 +73,68 @@ st.markdown("---")
 # --------------------------------------------------
 # COMPARABLE SALES TABLE (MANUAL INPUT)
 # --------------------------------------------------
-st.subheader("🏘 Comparable Sales (Manual Entry)")
+st.subheader("🏘 Comparable Sales")
 
 st.markdown("""
-Enter sold comparable properties.
+Import sold comparable properties from an export, or enter them manually.
 Recommended:
 - Sold within 12 months  
 - Within 0.7 miles  
 - Data from Zillow, Redfin, Realtor, County, MLS, ATTOM, etc.
 """)
 
-default_data = pd.DataFrame({
-    "Address": ["" for _ in range(5)],
-    "Sale Date (YYYY-MM-DD)": ["" for _ in range(5)],
-    "Sale Price": [0 for _ in range(5)],
-    "Beds": [0.0 for _ in range(5)],
-    "Baths": [0.0 for _ in range(5)],
-    "Sqft": [0.0 for _ in range(5)],
-    "Distance (miles)": [0.0 for _ in range(5)],
-    "Renovated? (Yes/No)": ["" for _ in range(5)],
-})
 
-comps_df = st.data_editor(default_data, num_rows="dynamic", use_container_width=True, key="comps_editor")
+
+# Built on first use – st.data_editor pulls in pandas, so the page only pays
+# for it once someone actually enters comps by hand
+@deferred
+def default_data():
+    return pd.DataFrame({
+        "Address": ["" for _ in range(5)],
+        "Sale Date (YYYY-MM-DD)": ["" for _ in range(5)],
+        "Sale Price": [0 for _ in range(5)],
+        "Beds": [0.0 for _ in range(5)],
+        "Baths": [0.0 for _ in range(5)],
+        "Sqft": [0.0 for _ in range(5)],
+        "Distance (miles)": [0.0 for _ in range(5)],
+        "Renovated? (Yes/No)": ["" for _ in range(5)],
+    })
+
+
+comps_source = st.radio("Comps source", ["Import export", "Manual entry"], horizontal=True)
+
+comps_file = None
+if comps_source == "Import export":
+    comps_file = st.file_uploader(
+        "Import comps from an MLS / county export (CSV or Excel)",
+        type=["csv", "xlsx", "xls"],
+        key="comps_file",
+    )
+
+comps_df = None
+ingest_report = None
+if comps_file is not None:
+    # Parsed, mapped and typed once per distinct file, then served from cache
+    try:
+        comps_df, ingest_report = ingest_comps(comps_file.getvalue(), comps_file.name)
+    except CompsIngestError as e:
+        st.error(str(e))
+
+if ingest_report is not None:
+    st.success(
+        f"Imported {ingest_report['rows_valid']:,} valid comps"
+        + (" (cached)" if ingest_report["cached"] else f" of {ingest_report['rows_in']:,} rows")
+    )
+    if ingest_report.get("rows_rejected"):
+        st.warning(
+            f"{ingest_report['rows_rejected']:,} rows skipped – no usable Sale Price or Sqft "
+            "(blank, zero or not a number)."
+        )
+    if ingest_report.get("missing"):
+        st.info("Columns not found in the export: " + ", ".join(ingest_report["missing"]))
+    st.dataframe(comps_df.head(200), use_container_width=True)
+elif comps_source == "Manual entry":
+    comps_df = st.data_editor(default_data(), num_rows="dynamic", use_container_width=True, key="comps_editor")
 
 st.markdown("---")
 
@@ -96,26 +143,63 @@ st.markdown("---")
 # --------------------------------------------------
 st.subheader("📈 ARV Calculation")
 
-if st.button("Calculate ARV"):
-    df = comps_df.copy()
+# Time-adjust older comp sales with the local market price index (data/market)
+market_store = get_market_store()
+
+# Default to the subject's own market – its zip, then the address parts
+# after the street (e.g. the city) – never to some other market
+market_candidates = re.findall(r"\b\d{5}\b", subject_address)[-1:]
+market_candidates += [part.strip() for part in reversed(subject_address.split(",")[1:])]
+market_default = next((k for k in market_candidates if k and market_store.has(k)), "")
+
+col_m1, col_m2 = st.columns(2)
+with col_m1:
+    market_key = st.text_input(
+        "Market index (zip or market name)",
+        value=market_default,
+        help="Monthly price index loaded from data/market/*.csv",
+    )
+with col_m2:
+    lookback_months = st.slider("Comp lookback (months)", 6, 36, 12)
+
+time_adjust = bool(market_key) and market_store.has(market_key)
+if market_key and not time_adjust:
+    st.info(f"No price index for '{market_key}' – comps are used at their sale price.")
 
-    # Convert values
-    df["Sale Price"] = pd.to_numeric(df["Sale Price"], errors="coerce")
-    df["Sqft"] = pd.to_numeric(df["Sqft"], errors="coerce")
-    df["Distance (miles)"] = pd.to_numeric(df["Distance (miles)"], errors="coerce")
-    df["Sale Date (YYYY-MM-DD)"] = pd.to_datetime(df["Sale Date (YYYY-MM-DD)"], errors="coerce")
+if st.button("Calculate ARV"):
+    if comps_df is None:
+        st.error("Import a comps export or switch to manual entry first.")
+        st.stop()
 
-    df = df.dropna(subset=["Sale Price", "Sqft"])
+    # No-op for imported comps, which are already typed
+    df = type_comps(comps_df)
 
     if df.empty:
         st.error("No valid comps detected!")
     else:
-        df["Price per Sqft"] = df["Sale Price"] / df["Sqft"]
+        if time_adjust:
+            # Bring every sale to the latest index month; the typed frame may be cached, so copy
+            df = df.copy()
+            df["Time Adj. Factor"] = market_store.adjustment_factors(market_key, df["Sale Date (YYYY-MM-DD)"])
+            df["Index Covers Sale"] = market_store.index_covers(market_key, df["Sale Date (YYYY-MM-DD)"])
+            df["Adj. Sale Price"] = df["Sale Price"] * df["Time Adj. Factor"]
+            df["Price per Sqft"] = df["Adj. Sale Price"] / df["Sqft"]
+            st.caption(
+                f"Sale prices time-adjusted to {market_store.latest_month(market_key)} "
+                f"with the {market_key} price index."
+            )
+            uncovered = int((df["Sale Date (YYYY-MM-DD)"].notna() & ~df["Index Covers Sale"]).sum())
+            if uncovered:
+                st.warning(
+                    f"{uncovered} comps sold outside the {market_key} index "
+                    f"({market_store.first_month(market_key)} to {market_store.latest_month(market_key)}) – "
+                    "they're adjusted from the nearest index month (see 'Index Covers Sale')."
+                )
 
         today = datetime.today()
-        last_12_months = today - timedelta(days=365)
+        lookback_start = today - timedelta(days=round(lookback_months * 30.44))
 
-        df_recent = df[df["Sale Date (YYYY-MM-DD)"] >= last_12_months]
+        df_recent = df[df["Sale Date (YYYY-MM-DD)"] >= lookback_start]
         df_recent_radius = df_recent[df_recent["Distance (miles)"] <= 0.7]
 
         filtered = df_recent_radius
@@ -123,7 +207,7 @@ if st.button("Calculate ARV"):
         notes = []
 
         if len(filtered) < 3:
-            notes.append("Less than 3 comps within 12 months + 0.7 miles.")
+            notes.append(f"Less than 3 comps within {lookback_months} months + 0.7 miles.")
             filtered = df_recent
 
         if len(filtered) < 3:
@@ -156,6 +240,10 @@ if st.button("Calculate ARV"):
             colC.metric("Min $/sqft", f"${min_ppsqft:,.0f}")
             colD.metric("Max $/sqft", f"${max_ppsqft:,.0f}")
 
+            if selected_snapshot != "-- Select --" and arv_median > 0:
+                # Picked up by the batch deal reports on the main page
+                st.session_state.setdefault("arv_results", {})[selected_snapshot] = float(arv_median)
+
             st.subheader("🏁 ARV Estimates")
             st.metric("ARV (Median)", f"${arv_median:,.0f}")
             st.metric("ARV (Average)", f"${arv_avg:,.0f}")
@@ -164,3 +252,27 @@ if st.button("Calculate ARV"):
 
             st.subheader("📋 Comps Used")
             st.dataframe(filtered)
+
+            report_html = render_deal_report({
+                "name": subject_address or "subject",
+                "snapshot": {
+                    "address": subject_address,
+                    "beds": subject_beds,
+                    "baths": subject_baths,
+                    "sqft": subject_sqft,
+                    "year_built": subject_year,
+                },
+                "arv": {
+                    "arv_median": arv_median,
+                    "arv_avg": arv_avg,
+                    "arv_low": arv_low,
+                    "arv_high": arv_high,
+                },
+                "comps": filtered.head(100),
+            })
+            st.download_button(
+                "📄 Download ARV report (HTML)",
+                report_html.encode("utf-8"),
+                file_name="arv_report.html",
+                mime="text/html",
+            )
@@ -1,5 +1,9 @@
 import json
-import openai
+
+from utils.lazy import lazy_import
+
+# openai is only needed once an analysis is actually requested
+openai = lazy_import("openai")
 
 def ASK_AI(address):
     """
@@ -0,0 +1,221 @@
+from __future__ import annotations
+
+import io
+import os
+import re
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+
+from utils.lazy import lazy_import
+from utils.storage import DATA_DIR, atomic_write
+
+pd = lazy_import("pandas")
+
+# -------------------------------------------
+# 🔹 Comps ingest – MLS / county CSV & Excel exports
+# -------------------------------------------
+# Parses a large export once (multithreaded pyarrow CSV reader when
+# available), maps its headers onto the ARV Analyzer comp schema, validates
+# and types it, and caches the typed frame by file hash – in memory for the
+# current process and as parquet under data/comps_cache/ across restarts.
+
+CACHE_DIR = os.path.join(DATA_DIR, "comps_cache")
+
+# Bump when COLUMN_ALIASES or type_comps change so cached frames are rebuilt
+SCHEMA_VERSION = 2
+
+# The ARV Analyzer's comp schema (same column names as its data editor)
+COMP_COLUMNS = [
+    "Address",
+    "Sale Date (YYYY-MM-DD)",
+    "Sale Price",
+    "Beds",
+    "Baths",
+    "Sqft",
+    "Distance (miles)",
+    "Renovated? (Yes/No)",
+]
+
+NUMERIC_COLUMNS = ["Sale Price", "Beds", "Baths", "Sqft", "Distance (miles)"]
+
+# Header aliases seen in MLS (RESO names), county and broker exports.
+# Compared after lower-casing and stripping everything but letters/digits.
+COLUMN_ALIASES: Dict[str, List[str]] = {
+    "Address": ["address", "fulladdress", "unparsedaddress", "streetaddress", "propertyaddress", "siteaddress"],
+    "Sale Date (YYYY-MM-DD)": ["saledate", "saledateyyyymmdd", "solddate", "closedate", "closingdate",
+                               "recordingdate", "datesold"],
+    "Sale Price": ["saleprice", "soldprice", "closeprice", "closingprice", "salesprice", "price", "saleamount"],
+    "Beds": ["beds", "bedrooms", "bedroomstotal", "br", "bd"],
+    "Baths": ["baths", "bathrooms", "bathroomstotal", "bathroomstotalinteger", "bathstotal", "ba"],
+    "Sqft": ["sqft", "livingarea", "livingareasqft", "gla", "squarefeet", "sqfeet", "abovegradefinishedarea",
+             "buildingsqft", "buildingarea"],
+    "Distance (miles)": ["distance", "distancemiles", "dist", "miles", "proximity"],
+    "Renovated? (Yes/No)": ["renovated", "renovatedyesno", "updated", "remodeled", "rehabbed"],
+}
+
+_YES = {"yes", "y", "true", "1", "renovated", "updated", "remodeled"}
+_NO = {"no", "n", "false", "0"}
+
+_MEMORY_CACHE: "OrderedDict[str, Tuple[Any, Dict[str, Any]]]" = OrderedDict()
+_MEMORY_CACHE_SIZE = 4
+
+
+class CompsIngestError(ValueError):
+    """Raised when an export can't be read (corrupt file, wrong format, missing Excel reader)."""
+
+
+def _normalize(header: str) -> str:
+    return re.sub(r"[^a-z0-9]", "", str(header).lower())
+
+
+def map_columns(headers: List[str]) -> Dict[str, str]:
+    """Return {raw header: comp column} for every header we recognise."""
+    lookup = {alias: canonical for canonical, aliases in COLUMN_ALIASES.items() for alias in aliases}
+    mapping: Dict[str, str] = {}
+    for header in headers:
+        canonical = lookup.get(_normalize(header))
+        if canonical and canonical not in mapping.values():
+            mapping[header] = canonical
+    return mapping
+
+
+def type_comps(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Validate and type a comps frame that already uses the comp column names.
+    Numbers formatted like "$150,000" or "1,100" are accepted. Drops rows
+    without a positive Sale Price and Sqft, adds Price per Sqft.
+    Safe to call on an already-typed frame (returns it unchanged).
+    """
+    if df.attrs.get("typed"):
+        return df
+
+    df = df.copy()
+    for col in COMP_COLUMNS:
+        if col not in df.columns:
+            df[col] = pd.NA
+
+    for col in NUMERIC_COLUMNS:
+        values = df[col]
+        if not pd.api.types.is_numeric_dtype(values):
+            values = values.astype("string").str.replace(r"[$,\s]", "", regex=True)
+        df[col] = pd.to_numeric(values, errors="coerce").astype("float64")
+    df["Sale Date (YYYY-MM-DD)"] = pd.to_datetime(df["Sale Date (YYYY-MM-DD)"], errors="coerce")
+
+    renovated = df["Renovated? (Yes/No)"].astype("string").str.strip().str.lower()
+    flag = pd.Series("", index=df.index, dtype=object)
+    flag[renovated.isin(_YES).fillna(False).to_numpy(dtype=bool)] = "Yes"
+    flag[renovated.isin(_NO).fillna(False).to_numpy(dtype=bool)] = "No"
+    df["Renovated? (Yes/No)"] = pd.Categorical(flag, categories=["Yes", "No", ""])
+    df["Address"] = df["Address"].astype("string").fillna("")
+
+    df = df[(df["Sale Price"] > 0) & (df["Sqft"] > 0)].reset_index(drop=True)
+    df = df[COMP_COLUMNS].copy()
+    df["Price per Sqft"] = df["Sale Price"] / df["Sqft"]
+    df.attrs["typed"] = True
+    return df
+
+
+def _read_csv(data: bytes, usecols: Optional[List[str]]) -> pd.DataFrame:
+    try:
+        # pyarrow's reader parses on all cores
+        return pd.read_csv(io.BytesIO(data), engine="pyarrow", usecols=usecols)
+    except (ImportError, ValueError):
+        return pd.read_csv(io.BytesIO(data), usecols=usecols, low_memory=False)
+
+
+def read_comps_file(data: bytes, filename: str) -> Tuple[pd.DataFrame, Dict[str, str]]:
+    """Parse a CSV / Excel export, keeping only the columns we can map."""
+    if filename.lower().endswith((".xlsx", ".xls")):
+        raw = pd.read_excel(io.BytesIO(data))
+        mapping = map_columns(list(raw.columns))
+        return raw[list(mapping)].rename(columns=mapping), mapping
+
+    # Read the header line first so the full parse skips unmapped columns
+    header = pd.read_csv(io.BytesIO(data), nrows=0).columns.tolist()
+    mapping = map_columns(header)
+    raw = _read_csv(data, list(mapping) or None)
+    return raw.rename(columns=mapping), mapping
+
+
+def _cache_get(key: str):
+    if key in _MEMORY_CACHE:
+        _MEMORY_CACHE.move_to_end(key)
+        return _MEMORY_CACHE[key]
+
+    path = os.path.join(CACHE_DIR, f"{key}.parquet")
+    if not os.path.exists(path):
+        return None
+    try:
+        df = pd.read_parquet(path)
+    except Exception:
+        return None
+    df.attrs["typed"] = True
+    try:
+        with open(os.path.join(CACHE_DIR, f"{key}.json"), "r") as f:
+            report = json.load(f)
+    except (OSError, ValueError):
+        report = {"rows_in": None, "rows_valid": len(df), "rows_rejected": None, "mapping": None, "missing": None}
+    return df, report
+
+
+def _cache_put(key: str, df: pd.DataFrame, report: Dict[str, Any], persist: bool = True):
+    _MEMORY_CACHE[key] = (df, report)
+    _MEMORY_CACHE.move_to_end(key)
+    while len(_MEMORY_CACHE) > _MEMORY_CACHE_SIZE:
+        _MEMORY_CACHE.popitem(last=False)
+
+    if persist:
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            path = os.path.join(CACHE_DIR, f"{key}.parquet")
+            # Write aside and rename so another session never reads a partial file
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            df.to_parquet(tmp, index=False)
+            os.replace(tmp, path)
+            atomic_write(os.path.join(CACHE_DIR, f"{key}.json"), json.dumps(report), fsync=False)
+        except Exception:
+            pass  # parquet engine missing / read-only disk – memory cache still works
+
+
+def ingest_comps(data: bytes, filename: str) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """
+    Parse, map, validate and type a comps export – once per distinct file.
+
+    Returns (typed comps frame, report). The report has rows_in, rows_valid,
+    rows_rejected (no positive Sale Price / Sqft after parsing), mapping
+    (raw header -> comp column), missing (comp columns not found) and cached
+    (True when the result came from the cache). Raises CompsIngestError if
+    the file can't be parsed.
+    """
+    key = f"v{SCHEMA_VERSION}-{hashlib.sha256(data).hexdigest()}"
+    hit = _cache_get(key)
+    if hit is not None:
+        df, report = hit
+        if key not in _MEMORY_CACHE:
+            _cache_put(key, df, report, persist=False)
+        return df, {**report, "cached": True}
+
+    try:
+        raw, mapping = read_comps_file(data, filename)
+    except ImportError as e:
+        raise CompsIngestError(
+            f"Reading {filename} needs an optional package ({e.name or e}): "
+            "pip install openpyxl (.xlsx) or xlrd (.xls)."
+        ) from None
+    except Exception as e:
+        # pandas raises ValueErrors (ParserError, EmptyDataError, decode errors);
+        # the Excel readers raise their own types (BadZipFile, XLRDError, ...)
+        raise CompsIngestError(f"Couldn't read {filename}: {e}") from None
+    df = type_comps(raw)
+    report = {
+        "rows_in": len(raw),
+        "rows_valid": len(df),
+        "rows_rejected": len(raw) - len(df),
+        "mapping": mapping,
+        "missing": [c for c in COMP_COLUMNS if c not in mapping.values()],
+    }
+    _cache_put(key, df, report)
+    return df, {**report, "cached": False}
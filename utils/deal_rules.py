@@ -0,0 +1,382 @@
+from __future__ import annotations
+
+import ast
+from typing import Dict, Any, Iterator, List, Optional, Union
+
+from utils.lazy import lazy_import
+from utils.financing import amortized_payment, noi_annual
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+# -------------------------------------------
+# 🔹 Buy-box rule engine
+# -------------------------------------------
+# Rules are plain expressions over BRRRR metrics and snapshot fields, e.g.
+#
+#     coc > 12 and cash_left_in < 15000 and year_built > 1950
+#
+# Each expression is parsed and compiled ONCE into a vectorized predicate
+# (and/or/not become &/|/~ over numpy arrays), then evaluated chunk by chunk
+# over a listing feed so memory stays constant no matter how big the feed is.
+
+# Same defaults as the sliders / inputs in app.py
+DEFAULT_ASSUMPTIONS: Dict[str, float] = {
+    "rehab": 30000.0,
+    "closing_buy": 0.0,
+    "ltv": 75.0,
+    "insurance_annual": 1200.0,
+    "maintenance_pct": 8.0,
+    "vacancy_pct": 5.0,
+    "mgmt_pct": 10.0,
+    "refi_rate": 8.0,
+    "refi_years": 30,
+    "seventy_rule_pct": 70.0,
+}
+
+# The two checks that used to live only on the BRRRR page
+DEFAULT_RULES: Dict[str, str] = {
+    "70% rule": "purchase <= seventy_rule_max",
+    "1% rule": "rent_monthly >= one_percent_required_rent",
+}
+
+# Feed column -> calc input. First column found wins.
+FEED_ALIASES: Dict[str, List[str]] = {
+    "purchase": ["purchase", "list_price", "price"],
+    "rent_monthly": ["rent_monthly", "rent_est", "rent_estimate", "rentZestimate"],
+    "tax_annual": ["tax_annual", "taxes_year", "property_tax"],
+    "arv": ["arv", "zestimate"],
+    "rehab": ["rehab", "rehab_estimate"],
+}
+
+_SAFE_FUNCS = {
+    "abs": lambda x: np.abs(x),
+    "min": lambda a, b: np.minimum(a, b),
+    "max": lambda a, b: np.maximum(a, b),
+    "isnull": lambda x: pd.isna(x),
+}
+
+_ALLOWED_NODES = (
+    ast.Expression, ast.BoolOp, ast.And, ast.Or, ast.UnaryOp, ast.Not, ast.USub, ast.UAdd,
+    ast.BinOp, ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Mod, ast.Pow, ast.FloorDiv,
+    ast.Compare, ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE,
+    ast.Name, ast.Load, ast.Constant, ast.Call,
+)
+
+
+class RuleError(ValueError):
+    """Raised when a rule can't be parsed, uses unsupported syntax or can't be applied to the data."""
+
+
+# ----- VECTORIZED BRRRR --------------------------------------------------
+def _column(df: pd.DataFrame, key: str, default: float) -> np.ndarray:
+    for name in FEED_ALIASES.get(key, [key]):
+        if name in df.columns:
+            values = pd.to_numeric(df[name], errors="coerce").to_numpy(dtype=float)
+            return np.where(np.isnan(values), default, values)
+    return np.full(len(df), float(default))
+
+
+def compute_brrrr_metrics(df: pd.DataFrame, assumptions: Optional[Dict[str, Any]] = None) -> pd.DataFrame:
+    """
+    Vectorized brrrr_core_calc over a frame of listings.
+    Feed columns win over `assumptions`; assumptions fill in everything else.
+    Rows without a purchase price, rent or ARV (no column, or a blank value)
+    get NaN for every metric that depends on it – rather than 0 or a made-up
+    ARV – so rules using those metrics are "not evaluable" for the row.
+    Returns a copy of `df` with the metric columns added.
+    """
+    a = {**DEFAULT_ASSUMPTIONS, **(assumptions or {})}
+    out = df.copy()
+
+    purchase = _column(df, "purchase", np.nan)
+    rehab = _column(df, "rehab", a["rehab"])
+    closing_buy = _column(df, "closing_buy", a["closing_buy"])
+    arv = _column(df, "arv", np.nan)
+    rent_monthly = _column(df, "rent_monthly", np.nan)
+    tax_annual = _column(df, "tax_annual", 0.0)
+    insurance_annual = _column(df, "insurance_annual", a["insurance_annual"])
+
+    total_cash_in = purchase + rehab + closing_buy
+    loan_amount = arv * (a["ltv"] / 100.0)
+    cash_left_in = np.maximum(total_cash_in - loan_amount, 0)
+
+    noi = noi_annual(
+        rent_monthly, tax_annual, insurance_annual,
+        a["maintenance_pct"], a["vacancy_pct"], a["mgmt_pct"],
+    )
+    monthly_payment = amortized_payment(loan_amount, a["refi_rate"], int(a["refi_years"]) * 12)
+    annual_debt_service = monthly_payment * 12
+    cashflow_annual = noi - annual_debt_service
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        coc = np.where(cash_left_in > 0, cashflow_annual / cash_left_in * 100.0, 0.0)
+        coc = np.where(np.isnan(cash_left_in), np.nan, coc)
+        cap_rate = np.where(purchase > 0, noi / purchase * 100.0, 0.0)
+        cap_rate = np.where(np.isnan(purchase) | np.isnan(noi), np.nan, cap_rate)
+        one_percent_ratio = np.where(purchase > 0, rent_monthly / purchase * 100.0, 0.0)
+        one_percent_ratio = np.where(np.isnan(purchase) | np.isnan(rent_monthly), np.nan, one_percent_ratio)
+
+    out["purchase"] = purchase
+    out["rehab"] = rehab
+    out["arv"] = arv
+    out["rent_monthly"] = rent_monthly
+    out["total_cash_in"] = total_cash_in
+    out["loan_amount"] = loan_amount
+    out["cash_left_in"] = cash_left_in
+    out["noi"] = noi
+    out["cap_rate"] = cap_rate
+    out["cashflow_annual"] = cashflow_annual
+    out["cashflow_monthly"] = cashflow_annual / 12
+    out["coc"] = coc
+    out["seventy_rule_max"] = arv * (a["seventy_rule_pct"] / 100.0) - rehab
+    out["one_percent_required_rent"] = purchase * 0.01
+    out["one_percent_ratio"] = one_percent_ratio
+    out["monthly_mortgage"] = monthly_payment
+    out["annual_debt_service"] = annual_debt_service
+    return out
+
+
+# ----- COMPILER ----------------------------------------------------------
+class _Vectorize(ast.NodeTransformer):
+    """Rewrite python boolean logic into element-wise numpy operators."""
+
+    def visit_BoolOp(self, node):
+        self.generic_visit(node)
+        op = ast.BitAnd() if isinstance(node.op, ast.And) else ast.BitOr()
+        expr = node.values[0]
+        for value in node.values[1:]:
+            expr = ast.BinOp(left=expr, op=op, right=value)
+        return expr
+
+    def visit_UnaryOp(self, node):
+        self.generic_visit(node)
+        if isinstance(node.op, ast.Not):
+            return ast.UnaryOp(op=ast.Invert(), operand=node.operand)
+        return node
+
+    def visit_Compare(self, node):
+        # a < b < c  ->  (a < b) & (b < c)
+        self.generic_visit(node)
+        if len(node.ops) == 1:
+            return node
+        left = node.left
+        parts = []
+        for op, right in zip(node.ops, node.comparators):
+            parts.append(ast.Compare(left=left, ops=[op], comparators=[right]))
+            left = right
+        expr = parts[0]
+        for part in parts[1:]:
+            expr = ast.BinOp(left=expr, op=ast.BitAnd(), right=part)
+        return expr
+
+
+def _parse(expression: str) -> ast.Expression:
+    try:
+        tree = ast.parse(expression.strip(), mode="eval")
+    except SyntaxError as e:
+        raise RuleError(f"Invalid rule '{expression}': {e.msg}") from None
+
+    for node in ast.walk(tree):
+        if not isinstance(node, _ALLOWED_NODES):
+            raise RuleError(f"Unsupported syntax in rule '{expression}': {type(node).__name__}")
+        if isinstance(node, ast.Call):
+            if not isinstance(node.func, ast.Name) or node.func.id not in _SAFE_FUNCS or node.keywords:
+                raise RuleError(f"Unsupported function in rule '{expression}'")
+    return tree
+
+
+def _compile(tree: ast.AST, source: str):
+    tree = ast.fix_missing_locations(_Vectorize().visit(tree))
+    return compile(tree, f"<rule: {source}>", "eval")
+
+
+def _names(node: ast.AST) -> List[str]:
+    return sorted({
+        n.id for n in ast.walk(node)
+        if isinstance(n, ast.Name) and n.id not in _SAFE_FUNCS
+    })
+
+
+def _field(values: pd.Series, force_numeric: bool = False) -> np.ndarray:
+    """
+    Column as the rule sees it. Text columns holding numbers ("1950",
+    "unknown", "") become floats with NaN for the junk; genuinely textual
+    columns (e.g. type == 'SingleFamily') are left alone unless
+    `force_numeric`.
+    """
+    if values.dtype == object or pd.api.types.is_string_dtype(values.dtype):
+        numeric = pd.to_numeric(values, errors="coerce")
+        if force_numeric or numeric.notna().any() or values.isna().all():
+            return numeric.to_numpy(dtype=float)
+    return values.to_numpy()
+
+
+class CompiledRule:
+    """
+    One buy-box rule, compiled once.
+    A top-level `and` is split into clauses so each row can report which
+    clause passed or failed. A clause whose fields are blank for a row
+    (e.g. no ARV) is "not evaluable" there: it doesn't pass and is marked
+    with ? instead of ✗.
+    """
+
+    def __init__(self, name: str, expression: str):
+        self.name = name
+        self.expression = expression
+
+        tree = _parse(expression)
+        body = tree.body
+        if isinstance(body, ast.BoolOp) and isinstance(body.op, ast.And):
+            clause_nodes = body.values
+        else:
+            clause_nodes = [body]
+
+        self.clauses = []
+        for node in clause_nodes:
+            source = ast.unparse(node)
+            # For "x > 5" keep the left side so the reason can show the actual value
+            lhs = None
+            if isinstance(node, ast.Compare) and not isinstance(node.left, ast.Constant):
+                lhs = _compile(ast.Expression(body=node.left), source)
+            # Clauses that test for blanks themselves are always evaluable
+            checks_null = any(
+                isinstance(n, ast.Call) and isinstance(n.func, ast.Name) and n.func.id == "isnull"
+                for n in ast.walk(node)
+            )
+            inputs = [] if checks_null else _names(node)
+            self.clauses.append((source, _compile(ast.Expression(body=node), source), lhs, inputs))
+
+        self.names = _names(tree)
+
+    def evaluate(self, df: pd.DataFrame):
+        """Return (passed mask, evaluable mask, reasons Series) for every row of `df`."""
+        missing = [n for n in self.names if n not in df.columns]
+        if missing:
+            raise RuleError(f"Rule '{self.name}' uses unknown fields: {', '.join(missing)}")
+
+        scope = {n: _field(df[n]) for n in self.names}
+        scope.update(_SAFE_FUNCS)
+
+        passed = np.ones(len(df), dtype=bool)
+        evaluable = np.ones(len(df), dtype=bool)
+        reasons = pd.Series([""] * len(df), index=df.index, dtype=object)
+        for source, code, lhs, inputs in self.clauses:
+            try:
+                ok = np.asarray(eval(code, {"__builtins__": {}}, scope), dtype=bool)
+            except TypeError:
+                # A chunk where a numeric field holds only junk ("unknown") – read it as blanks
+                scope.update({n: _field(df[n], force_numeric=True) for n in inputs or self.names})
+                try:
+                    ok = np.asarray(eval(code, {"__builtins__": {}}, scope), dtype=bool)
+                except TypeError as e:
+                    raise RuleError(f"Rule '{self.name}' can't compare the values in '{source}': {e}") from None
+            ok = np.broadcast_to(ok, passed.shape)
+
+            known = np.ones(len(df), dtype=bool)
+            for n in inputs:
+                known &= ~np.asarray(pd.isna(scope[n]), dtype=bool)
+            ok = ok & known
+            passed &= ok
+            evaluable &= known
+
+            text = pd.Series(
+                np.where(ok, f"✓ {source}", np.where(known, f"✗ {source}", f"? {source}")),
+                index=df.index,
+            )
+            if lhs is not None:
+                try:
+                    actual = np.asarray(eval(lhs, {"__builtins__": {}}, scope), dtype=float)
+                except (TypeError, ValueError):
+                    actual = None
+                if actual is not None:
+                    actual = np.broadcast_to(actual, passed.shape)
+                    shown = np.where(np.isnan(actual), "n/a", np.round(actual, 2).astype(str))
+                    text = text + " (" + pd.Series(shown, index=df.index) + ")"
+            reasons = reasons + np.where(reasons == "", "", "; ") + text
+
+        return passed, evaluable, f"{self.name}: " + reasons
+
+
+def compile_rules(rules: Union[str, Dict[str, str]]) -> List[CompiledRule]:
+    """Compile a single expression or a {name: expression} buy box."""
+    if isinstance(rules, str):
+        rules = {"buy box": rules}
+    return [CompiledRule(name, expr) for name, expr in rules.items()]
+
+
+# ----- SCREENING ---------------------------------------------------------
+def screen_frame(
+    df: pd.DataFrame,
+    rules: List[CompiledRule],
+    assumptions: Optional[Dict[str, Any]] = None,
+    keep_failed: bool = False,
+) -> pd.DataFrame:
+    """
+    Compute BRRRR metrics for one chunk of listings and apply the compiled
+    rules. Adds `passed`, `evaluable` (False when a rule needed a blank field,
+    e.g. ARV) and `reasons` columns; returns only passing rows unless
+    `keep_failed`.
+    """
+    frame = compute_brrrr_metrics(df, assumptions)
+
+    passed = np.ones(len(frame), dtype=bool)
+    evaluable = np.ones(len(frame), dtype=bool)
+    reasons = pd.Series([""] * len(frame), index=frame.index, dtype=object)
+    for rule in rules:
+        ok, known, why = rule.evaluate(frame)
+        passed &= ok
+        evaluable &= known
+        reasons = reasons + np.where(reasons == "", "", " | ") + why
+
+    frame["passed"] = passed
+    frame["evaluable"] = evaluable
+    frame["reasons"] = reasons
+    if keep_failed:
+        return frame
+    return frame[passed]
+
+
+def screen_feed(
+    source,
+    rules: Union[str, Dict[str, str], List[CompiledRule]],
+    assumptions: Optional[Dict[str, Any]] = None,
+    chunksize: int = 50_000,
+    keep_failed: bool = False,
+) -> Iterator[pd.DataFrame]:
+    """
+    Stream a listing feed (CSV path / buffer, or an iterable of DataFrames)
+    through the buy box, yielding the passing rows of each chunk.
+    Rules are compiled once, before the first chunk is read.
+    """
+    if not isinstance(rules, list):
+        rules = compile_rules(rules)
+
+    if isinstance(source, pd.DataFrame):
+        chunks = (source.iloc[i:i + chunksize] for i in range(0, len(source), chunksize))
+    elif hasattr(source, "read") or isinstance(source, str):
+        chunks = pd.read_csv(source, chunksize=chunksize)
+    else:
+        chunks = source
+
+    for chunk in chunks:
+        result = screen_frame(chunk, rules, assumptions, keep_failed)
+        if not result.empty:
+            yield result
+
+
+def screen_feed_to_csv(
+    source,
+    dest,
+    rules: Union[str, Dict[str, str], List[CompiledRule]],
+    assumptions: Optional[Dict[str, Any]] = None,
+    chunksize: int = 50_000,
+) -> int:
+    """Screen a feed and append the passing deals to `dest`. Returns the number of passing rows."""
+    total = 0
+    header = True
+    for passed in screen_feed(source, rules, assumptions, chunksize):
+        passed.to_csv(dest, mode="w" if header else "a", header=header, index=False)
+        header = False
+        total += len(passed)
+    return total
@@ -0,0 +1,232 @@
+from __future__ import annotations
+
+import json
+from typing import Dict, Any, List, Optional
+
+from utils.lazy import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+# -------------------------------------------
+# 🔹 Loan products described as data
+# -------------------------------------------
+# Every product in a catalog is one row with these columns. Missing columns
+# fall back to the defaults below, so a catalog only has to spell out what is
+# different about each product.
+#
+#   rate              refi annual rate (%)
+#   points            refi origination points (% of loan)
+#   max_ltv           max loan as % of ARV
+#   dscr_min          lender minimum DSCR (0 = no DSCR test)
+#   seasoning_months  months owned before the lender will refi on ARV; the
+#                     refi waits for it, and taxes / insurance (plus any
+#                     bridge interest) are carried until then
+#   io_months         interest-only months at the start of the loan
+#   term_years        amortization term
+#   bridge_rate       hard-money annual rate during rehab / seasoning (%)
+#   bridge_points     hard-money points (% of bridge loan)
+#   bridge_ltc        hard-money loan-to-cost (% of purchase + rehab)
+#   rehab_months      months the bridge loan is carried during rehab
+
+PRODUCT_DEFAULTS: Dict[str, Any] = {
+    "name": "",
+    "kind": "refi",
+    "rate": 8.0,
+    "points": 0.0,
+    "max_ltv": 75.0,
+    "dscr_min": 0.0,
+    "seasoning_months": 0,
+    "io_months": 0,
+    "term_years": 30,
+    "bridge_rate": 0.0,
+    "bridge_points": 0.0,
+    "bridge_ltc": 0.0,
+    "rehab_months": 0,
+}
+
+DEFAULT_PRODUCTS: List[Dict[str, Any]] = [
+    {"name": "Conventional 30y", "kind": "refi", "rate": 7.25, "points": 1.0,
+     "max_ltv": 75, "seasoning_months": 6, "term_years": 30},
+    {"name": "DSCR 30y", "kind": "dscr", "rate": 8.0, "points": 2.0,
+     "max_ltv": 75, "dscr_min": 1.2, "seasoning_months": 3, "term_years": 30},
+    {"name": "DSCR 30y IO-10", "kind": "dscr", "rate": 8.5, "points": 2.0,
+     "max_ltv": 75, "dscr_min": 1.0, "seasoning_months": 3, "io_months": 120,
+     "term_years": 30},
+    {"name": "HELOC (IO)", "kind": "heloc", "rate": 9.0, "points": 0.0,
+     "max_ltv": 80, "io_months": 120, "term_years": 20},
+    {"name": "Hard money → DSCR", "kind": "bridge", "rate": 8.0, "points": 2.0,
+     "max_ltv": 75, "dscr_min": 1.1, "seasoning_months": 6, "term_years": 30,
+     "bridge_rate": 12.0, "bridge_points": 2.0, "bridge_ltc": 90,
+     "rehab_months": 4},
+]
+
+
+def build_product_catalog(products: List[Dict[str, Any]]) -> pd.DataFrame:
+    """
+    Turn a list of product dicts into a typed catalog DataFrame.
+    Unknown keys are kept (e.g. lender name), missing keys get PRODUCT_DEFAULTS.
+    """
+    catalog = pd.DataFrame(products)
+    for col, default in PRODUCT_DEFAULTS.items():
+        if col not in catalog.columns:
+            catalog[col] = default
+        elif col not in ("name", "kind"):
+            catalog[col] = pd.to_numeric(catalog[col], errors="coerce").fillna(default)
+        else:
+            catalog[col] = catalog[col].fillna(default).astype(str)
+
+    if (catalog["name"] == "").any():
+        unnamed = catalog["name"] == ""
+        catalog.loc[unnamed, "name"] = [f"product_{i}" for i in catalog.index[unnamed]]
+
+    return catalog.reset_index(drop=True)
+
+
+def load_product_catalog(path: str) -> pd.DataFrame:
+    """Load a product catalog from a .csv or .json file (list of products)."""
+    if path.endswith(".json"):
+        with open(path, "r") as f:
+            return build_product_catalog(json.load(f))
+    return build_product_catalog(pd.read_csv(path).to_dict("records"))
+
+
+# ----- VECTOR HELPERS ----------------------------------------------------
+def amortized_payment(loan, annual_rate_pct, months):
+    """
+    Monthly principal + interest payment, element-wise over numpy arrays.
+    Same formula as brrrr_core_calc, including the 0% rate case.
+    """
+    loan = np.asarray(loan, dtype=float)
+    r = np.asarray(annual_rate_pct, dtype=float) / 100.0 / 12.0
+    n = np.asarray(months, dtype=float)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        growth = (1 + r) ** n
+        pay = loan * (r * growth) / (growth - 1)
+        flat = np.where(n > 0, loan / n, 0.0)
+    return np.where(r > 0, pay, flat)
+
+
+def noi_annual(rent_monthly, tax_annual, insurance_annual,
+               maintenance_pct, vacancy_pct, mgmt_pct):
+    """NOI exactly as brrrr_core_calc computes it; works on scalars or arrays."""
+    annual_rent = rent_monthly * 12
+    variable = annual_rent * (maintenance_pct + vacancy_pct + mgmt_pct) / 100.0
+    return annual_rent - (tax_annual + insurance_annual + variable)
+
+
+# ----- EVALUATION --------------------------------------------------------
+def evaluate_financing(deal: Dict[str, Any], catalog: pd.DataFrame) -> pd.DataFrame:
+    """
+    Evaluate every loan product in `catalog` against one deal in a single
+    vectorized pass.
+
+    `deal` uses the same keys as brrrr_core_calc: purchase, rehab, closing_buy,
+    arv, rent_monthly, tax_annual, insurance_annual, maintenance_pct,
+    vacancy_pct, mgmt_pct.
+
+    Every product is refinanced once both rehab and seasoning are done
+    (`months_to_refi`); taxes and insurance for those months are paid out of
+    pocket and count toward cash in (`holding_cost`).
+
+    Returns one row per product with cash left in, CoC, DSCR and a
+    `dscr_ok` flag, ranked: feasible products first, then lowest cash left
+    in, then highest CoC.
+    """
+    purchase = float(deal.get("purchase", 0) or 0)
+    rehab = float(deal.get("rehab", 0) or 0)
+    closing_buy = float(deal.get("closing_buy", 0) or 0)
+    arv = float(deal.get("arv", 0) or 0)
+    tax_annual = float(deal.get("tax_annual", 0) or 0)
+    insurance_annual = float(deal.get("insurance_annual", 0) or 0)
+
+    noi = noi_annual(
+        float(deal.get("rent_monthly", 0) or 0),
+        tax_annual,
+        insurance_annual,
+        float(deal.get("maintenance_pct", 0) or 0),
+        float(deal.get("vacancy_pct", 0) or 0),
+        float(deal.get("mgmt_pct", 0) or 0),
+    )
+
+    rate = catalog["rate"].to_numpy(dtype=float)
+    term_months = catalog["term_years"].to_numpy(dtype=float) * 12
+    io_months = np.minimum(catalog["io_months"].to_numpy(dtype=float), term_months)
+
+    # Bridge (hard money) carried through rehab, and until seasoning is met
+    project_cost = purchase + rehab
+    bridge_loan = project_cost * catalog["bridge_ltc"].to_numpy(dtype=float) / 100.0
+    hold_months = np.maximum(
+        catalog["rehab_months"].to_numpy(dtype=float),
+        catalog["seasoning_months"].to_numpy(dtype=float),
+    )
+    bridge_interest = bridge_loan * catalog["bridge_rate"].to_numpy(dtype=float) / 100.0 / 12.0 * hold_months
+    bridge_fees = bridge_loan * catalog["bridge_points"].to_numpy(dtype=float) / 100.0
+    bridge_cost = bridge_interest + bridge_fees
+
+    # Taxes and insurance carried until the refi, whoever finances the purchase
+    holding_cost = (tax_annual + insurance_annual) / 12.0 * hold_months
+
+    # Refi
+    loan_amount = arv * catalog["max_ltv"].to_numpy(dtype=float) / 100.0
+    refi_points = loan_amount * catalog["points"].to_numpy(dtype=float) / 100.0
+
+    total_cash_in = project_cost + closing_buy + bridge_cost + holding_cost + refi_points
+    cash_left_in = np.maximum(total_cash_in - loan_amount, 0)
+
+    # Year-one debt service: interest-only months first, then amortizing
+    io_payment = loan_amount * rate / 100.0 / 12.0
+    amort_months = term_months - io_months
+    # Interest-only for the whole term (e.g. a 10y IO HELOC): no amortizing part
+    amort_payment = np.where(
+        amort_months > 0,
+        amortized_payment(loan_amount, rate, np.maximum(amort_months, 1)),
+        io_payment,
+    )
+    io_in_year_one = np.minimum(io_months, 12)
+    annual_debt_service = io_payment * io_in_year_one + amort_payment * (12 - io_in_year_one)
+
+    cashflow_annual = noi - annual_debt_service
+    with np.errstate(divide="ignore", invalid="ignore"):
+        coc = np.where(cash_left_in > 0, cashflow_annual / cash_left_in * 100.0, 0.0)
+        dscr = np.where(annual_debt_service > 0, noi / annual_debt_service, np.inf)
+
+    dscr_min = catalog["dscr_min"].to_numpy(dtype=float)
+    dscr_ok = dscr >= dscr_min
+
+    results = pd.DataFrame({
+        "name": catalog["name"].to_numpy(),
+        "kind": catalog["kind"].to_numpy(),
+        "loan_amount": loan_amount,
+        "bridge_cost": bridge_cost,
+        "holding_cost": holding_cost,
+        "refi_points": refi_points,
+        "total_cash_in": total_cash_in,
+        "cash_left_in": cash_left_in,
+        "monthly_mortgage": annual_debt_service / 12,
+        "annual_debt_service": annual_debt_service,
+        "noi": np.full(len(catalog), noi),
+        "cashflow_monthly": cashflow_annual / 12,
+        "coc": coc,
+        "dscr": dscr,
+        "dscr_min": dscr_min,
+        "dscr_ok": dscr_ok,
+        "months_to_refi": hold_months,
+    })
+
+    results = results.sort_values(
+        ["dscr_ok", "cash_left_in", "coc"],
+        ascending=[False, True, False],
+        kind="mergesort",
+    ).reset_index(drop=True)
+    results.insert(0, "rank", np.where(results["dscr_ok"], np.arange(1, len(results) + 1), 0))
+    return results
+
+
+def best_feasible(results: pd.DataFrame) -> Optional[Dict[str, Any]]:
+    """Top-ranked product that passes its DSCR test, or None."""
+    feasible = results[results["dscr_ok"]]
+    if feasible.empty:
+        return None
+    return feasible.iloc[0].to_dict()
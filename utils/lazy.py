@@ -0,0 +1,92 @@
+import sys
+import time
+import types
+import importlib
+import threading
+import functools
+from typing import Dict
+
+# -------------------------------------------
+# 🔹 Lazy imports & deferred initialization
+# -------------------------------------------
+# `pd = lazy_import("pandas")` binds a placeholder module; the real import
+# happens on first attribute access (pd.DataFrame, ...). Pages that never touch
+# pandas / PIL / openai on a given run never pay for importing them.
+#
+# Streamlit runs each session's script on its own thread, so loading is
+# guarded by a lock (importlib.util.LazyLoader isn't thread-safe on 3.11).
+
+_lock = threading.RLock()
+
+# module name -> seconds spent on the real import (reported by utils.startup_profiler)
+IMPORT_TIMINGS: Dict[str, float] = {}
+
+
+class LazyModule(types.ModuleType):
+    """Placeholder module that imports the real one on first attribute access."""
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.__dict__["_lazy_loaded"] = None
+
+    def _load(self):
+        module = self.__dict__["_lazy_loaded"]
+        if module is not None:
+            return module
+
+        with _lock:
+            module = self.__dict__["_lazy_loaded"]
+            if module is None:
+                start = time.perf_counter()
+                module = importlib.import_module(self.__name__)
+                IMPORT_TIMINGS[self.__name__] = time.perf_counter() - start
+                # Copy the real namespace in so later lookups skip __getattr__
+                self.__dict__.update(module.__dict__)
+                self.__dict__["_lazy_loaded"] = module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        state = "loaded" if self.__dict__["_lazy_loaded"] is not None else "not loaded"
+        return f"<lazy module '{self.__name__}' ({state})>"
+
+
+def lazy_import(name: str):
+    """
+    Return `name` if it's already imported, otherwise a LazyModule that
+    imports it on first use.
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    return LazyModule(name)
+
+
+def is_loaded(name: str) -> bool:
+    """True if the real module `name` has been imported."""
+    return name in sys.modules
+
+
+def deferred(fn):
+    """
+    Run an expensive zero-argument initializer once, on first call, and
+    reuse the result (thread-safe). Use for clients, catalogs, lookup tables.
+    """
+    sentinel = object()
+    result = sentinel
+
+    @functools.wraps(fn)
+    def wrapper():
+        nonlocal result
+        if result is sentinel:
+            with _lock:
+                if result is sentinel:
+                    result = fn()
+        return result
+
+    return wrapper
@@ -0,0 +1,299 @@
+from __future__ import annotations
+
+import os
+import glob
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+
+from utils.lazy import lazy_import
+from utils.storage import DATA_DIR
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+# -------------------------------------------
+# 🔹 Local market time-series store
+# -------------------------------------------
+# Monthly price and rent indices per zip / market, loaded from CSV files in
+# data/market/ with columns:
+#
+#     market, month, price_index, rent_index
+#
+# (`market` is a zip or a name like "Indianapolis, IN"; `month` anything
+# pandas can parse, e.g. 2024-03 or 2024-03-01; either index may be blank.)
+#
+# Each series is stored as one dense monthly array, gaps forward-filled, with
+# prefix sums, 12-month rolling means, YoY growth and quarterly / annual
+# rollups computed once at load. A month maps to an array offset by
+# arithmetic, so point lookups, range means and growth rates are O(1) per
+# series – nothing scans raw history at query time.
+
+MARKET_DIR = os.path.join(DATA_DIR, "market")
+
+KINDS = ("price", "rent")
+
+# YoY price growth (%) above / below which a market is "Rising" / "Falling"
+TREND_THRESHOLD_PCT = 2.0
+
+
+def _month_ordinal(value) -> Optional[int]:
+    """Months since year 0 for a date-like value (None if it can't be parsed)."""
+    try:
+        ts = pd.Timestamp(value)
+    except (TypeError, ValueError):
+        return None
+    if pd.isna(ts):
+        return None
+    return ts.year * 12 + ts.month - 1
+
+
+def normalize_market(market: str) -> str:
+    return " ".join(str(market).strip().lower().split())
+
+
+class _Series:
+    """One market's dense monthly arrays plus everything precomputed from them."""
+
+    __slots__ = ("start", "values", "prefix", "rolling12", "yoy", "rollups")
+
+    def __init__(self, start: int, values: Dict[str, Any]):
+        self.start = start
+        self.values = values
+        self.prefix = {}
+        self.rolling12 = {}
+        self.yoy = {}
+        self.rollups = {}
+
+        for kind, arr in values.items():
+            prefix = np.concatenate([[0.0], np.cumsum(arr)])
+            self.prefix[kind] = prefix
+
+            idx = np.arange(len(arr))
+            lo = np.maximum(idx - 11, 0)
+            self.rolling12[kind] = (prefix[idx + 1] - prefix[lo]) / (idx + 1 - lo)
+
+            yoy = np.full(len(arr), np.nan)
+            if len(arr) > 12:
+                yoy[12:] = (arr[12:] / arr[:-12] - 1) * 100.0
+            self.yoy[kind] = yoy
+
+            self.rollups[kind] = {
+                "Q": self._downsample(arr, 3),
+                "Y": self._downsample(arr, 12),
+            }
+
+    def _downsample(self, arr, months: int) -> List[Tuple[str, float]]:
+        """Calendar-aligned period means, e.g. 2024Q1 or 2024."""
+        out = []
+        first = self.start - (self.start % months)
+        for period_start in range(first, self.start + len(arr), months):
+            lo = max(period_start - self.start, 0)
+            hi = min(period_start + months - self.start, len(arr))
+            year, month0 = divmod(period_start, 12)
+            label = f"{year}Q{month0 // 3 + 1}" if months == 3 else str(year)
+            out.append((label, float(arr[lo:hi].mean())))
+        return out
+
+    @property
+    def end(self) -> int:
+        return self.start + len(next(iter(self.values.values()))) - 1
+
+    def offset(self, ordinal: int) -> int:
+        """Array position of a month, clamped to the series' range."""
+        return int(min(max(ordinal - self.start, 0), self.end - self.start))
+
+
+class MarketSeriesStore:
+    """Embedded store of monthly price / rent indices keyed by zip or market name."""
+
+    def __init__(self, series: Optional[Dict[str, _Series]] = None):
+        self._series = series or {}
+
+    # ----- loading -------------------------------------------------------
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "MarketSeriesStore":
+        df = df.copy()
+        df.columns = [str(c).strip().lower() for c in df.columns]
+        if "market" not in df.columns or "month" not in df.columns:
+            raise ValueError("Market files need 'market' and 'month' columns.")
+
+        dates = pd.to_datetime(df["month"], errors="coerce")
+        df["_ord"] = dates.dt.year * 12 + dates.dt.month - 1
+        df["_market"] = df["market"].astype(str).map(normalize_market)
+        df = df.dropna(subset=["_ord"])
+
+        series = {}
+        for market, group in df.groupby("_market", sort=False):
+            group = group.groupby("_ord").last().sort_index()
+            start, end = int(group.index.min()), int(group.index.max())
+            dense = group.reindex(range(start, end + 1))
+
+            values = {}
+            for kind in KINDS:
+                col = f"{kind}_index"
+                if col not in dense.columns:
+                    continue
+                arr = pd.to_numeric(dense[col], errors="coerce").ffill().bfill().to_numpy(dtype=float)
+                if not np.isnan(arr).all() and (arr > 0).all():
+                    values[kind] = arr
+            if values:
+                series[market] = _Series(start, values)
+        return cls(series)
+
+    @classmethod
+    def load(cls, folder: str = MARKET_DIR) -> "MarketSeriesStore":
+        files = sorted(glob.glob(os.path.join(folder, "*.csv")))
+        if not files:
+            return cls()
+        return cls.from_frame(pd.concat((pd.read_csv(f) for f in files), ignore_index=True))
+
+    # ----- queries -------------------------------------------------------
+    def markets(self) -> List[str]:
+        return sorted(self._series)
+
+    def has(self, market: str, kind: str = "price") -> bool:
+        s = self._series.get(normalize_market(market))
+        return s is not None and kind in s.values
+
+    def _get(self, market: str, kind: str) -> Optional[_Series]:
+        s = self._series.get(normalize_market(market))
+        if s is None or kind not in s.values:
+            return None
+        return s
+
+    def latest_month(self, market: str) -> Optional[str]:
+        s = self._series.get(normalize_market(market))
+        if s is None:
+            return None
+        year, month0 = divmod(s.end, 12)
+        return f"{year}-{month0 + 1:02d}"
+
+    def first_month(self, market: str) -> Optional[str]:
+        s = self._series.get(normalize_market(market))
+        if s is None:
+            return None
+        year, month0 = divmod(s.start, 12)
+        return f"{year}-{month0 + 1:02d}"
+
+    def value_at(self, market: str, when, kind: str = "price") -> Optional[float]:
+        """Index value for the month of `when` (clamped to the series range)."""
+        s = self._get(market, kind)
+        ordinal = _month_ordinal(when)
+        if s is None or ordinal is None:
+            return None
+        return float(s.values[kind][s.offset(ordinal)])
+
+    def range_mean(self, market: str, start, end, kind: str = "price") -> Optional[float]:
+        """Mean index over [start, end] months, from prefix sums."""
+        s = self._get(market, kind)
+        lo_ord, hi_ord = _month_ordinal(start), _month_ordinal(end)
+        if s is None or lo_ord is None or hi_ord is None:
+            return None
+        lo, hi = sorted((s.offset(lo_ord), s.offset(hi_ord)))
+        prefix = s.prefix[kind]
+        return float((prefix[hi + 1] - prefix[lo]) / (hi + 1 - lo))
+
+    def rolling_mean_12m(self, market: str, when=None, kind: str = "price") -> Optional[float]:
+        s = self._get(market, kind)
+        if s is None:
+            return None
+        ordinal = s.end if when is None else _month_ordinal(when)
+        if ordinal is None:
+            return None
+        return float(s.rolling12[kind][s.offset(ordinal)])
+
+    def growth_rate(self, market: str, months: int = 12, kind: str = "price", as_of=None) -> Optional[float]:
+        """
+        Annualized growth (%) over the trailing `months`, ending at `as_of`
+        (default: latest month). None when the series is shorter than that.
+        """
+        s = self._get(market, kind)
+        if s is None or months <= 0:
+            return None
+        if as_of is None:
+            end = s.end
+        else:
+            ordinal = _month_ordinal(as_of)
+            if ordinal is None:
+                return None
+            end = s.start + s.offset(ordinal)
+        if end - months < s.start:
+            return None
+        arr = s.values[kind]
+        if months == 12:
+            value = s.yoy[kind][end - s.start]
+            return None if np.isnan(value) else float(value)
+        ratio = arr[end - s.start] / arr[end - months - s.start]
+        return float((ratio ** (12.0 / months) - 1) * 100.0)
+
+    def rollup(self, market: str, freq: str = "Y", kind: str = "price") -> List[Tuple[str, float]]:
+        """Precomputed quarterly ("Q") or annual ("Y") means."""
+        s = self._get(market, kind)
+        return [] if s is None else list(s.rollups[kind][freq])
+
+    def trend_label(self, market: str) -> Optional[str]:
+        growth = self.growth_rate(market, 12, "price")
+        if growth is None:
+            return None
+        if growth > TREND_THRESHOLD_PCT:
+            return "Rising"
+        if growth < -TREND_THRESHOLD_PCT:
+            return "Falling"
+        return "Stable"
+
+    def adjustment_factors(self, market: str, dates, to=None, kind: str = "price"):
+        """
+        Vectorized time adjustment: index(to) / index(sale month) per date.
+        `to` defaults to the latest month in the series; unparseable dates or
+        an unknown market give a factor of 1. Sale months outside the series
+        use its nearest month – flag them with index_covers().
+        """
+        dates = pd.to_datetime(pd.Series(dates), errors="coerce")
+        factors = np.ones(len(dates))
+        s = self._get(market, kind)
+        if s is None:
+            return factors
+
+        arr = s.values[kind]
+        target = arr[s.offset(_month_ordinal(to))] if to is not None else arr[-1]
+        valid = dates.notna().to_numpy()
+        ordinals = (dates.dt.year * 12 + dates.dt.month - 1).to_numpy(dtype=float)
+        offsets = np.clip(ordinals[valid] - s.start, 0, len(arr) - 1).astype(int)
+        factors[valid] = target / arr[offsets]
+        return factors
+
+    def index_covers(self, market: str, dates, kind: str = "price"):
+        """
+        Per date: True when its month lies within the market's series, i.e.
+        adjustment_factors() used the actual index for it. False for months
+        before the first / after the latest index month, unparseable dates
+        and unknown markets.
+        """
+        dates = pd.to_datetime(pd.Series(dates), errors="coerce")
+        s = self._get(market, kind)
+        if s is None:
+            return np.zeros(len(dates), dtype=bool)
+        ordinals = (dates.dt.year * 12 + dates.dt.month - 1).to_numpy(dtype=float)
+        with np.errstate(invalid="ignore"):
+            return (ordinals >= s.start) & (ordinals <= s.end)
+
+
+# ----- SHARED INSTANCE ---------------------------------------------------
+_store: Optional[MarketSeriesStore] = None
+_store_signature = None
+_store_lock = threading.Lock()
+
+
+def get_market_store(folder: str = MARKET_DIR) -> MarketSeriesStore:
+    """
+    Process-wide store, rebuilt only when the files in `folder` change
+    (checked by name / size / mtime, so a rerun costs one listdir).
+    """
+    global _store, _store_signature
+    files = sorted(glob.glob(os.path.join(folder, "*.csv")))
+    signature = tuple((f, os.path.getsize(f), os.path.getmtime(f)) for f in files)
+    with _store_lock:
+        if _store is None or signature != _store_signature:
+            _store = MarketSeriesStore.load(folder)
+            _store_signature = signature
+        return _store
@@ -0,0 +1,411 @@
+from __future__ import annotations
+
+import io
+import os
+import json
+import html
+import hashlib
+import zipfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
+
+from utils.lazy import lazy_import
+from utils.storage import DATA_DIR, atomic_write, load_snapshot_table
+from utils.snapshot_schema import snapshot_frame
+from utils.deal_rules import compute_brrrr_metrics
+
+pd = lazy_import("pandas")
+
+# -------------------------------------------
+# 🔹 Deal reports – lender / partner packets
+# -------------------------------------------
+# One self-contained HTML file per deal (inline CSS + SVG charts, no external
+# assets), optionally converted to PDF. The CPU-heavy PDF conversion runs in
+# spawned worker processes; HTML renders sequentially – it's string formatting
+# plus cache reads (well under a millisecond per deal), cheaper than starting
+# workers, and threads wouldn't help under the GIL. Reports land in a single
+# zip. Each report section is cached on disk by a hash of its inputs, so
+# re-running a batch only re-renders what changed; the cache keeps the
+# REPORT_CACHE_MAX_FILES most recently used entries.
+#
+# A deal is a dict:
+#   {"name": str, "snapshot": {...}, "brrrr": {...brrrr_core_calc results...},
+#    (metrics that need an ARV are left out of "brrrr" when the deal has none)
+#    "arv": {"arv_median", "arv_avg", "arv_low", "arv_high"} (optional),
+#    "comps": [ {...comp row...}, ... ] (optional),
+#    "financing": [ {...evaluate_financing row...}, ... ] (optional)}
+
+CACHE_DIR = os.path.join(DATA_DIR, "report_cache")
+
+# Bump when section markup changes so cached sections are re-rendered
+TEMPLATE_VERSION = 2
+
+# Cached sections / PDFs kept after a batch, most recently used first
+REPORT_CACHE_MAX_FILES = 5000
+
+PRIMARY_COLOR = "#3B82F6"
+ACCENT_COLOR = "#F97316"
+BG_SOFT = "#F5F7FB"
+
+_CSS = f"""
+body {{ font-family: -apple-system, Segoe UI, Roboto, Arial, sans-serif; color:#111827; margin:32px; }}
+h1 {{ margin:0 0 4px 0; }}
+.sub {{ color:#6B7280; margin-bottom:18px; }}
+.section {{ background:{BG_SOFT}; border:1px solid #E5E7EB; border-radius:14px; padding:14px 18px; margin:12px 0; }}
+.section h2 {{ font-size:18px; margin:0 0 8px 0; }}
+.metrics {{ display:flex; flex-wrap:wrap; gap:12px; }}
+.metric {{ background:white; border-radius:10px; padding:8px 12px; min-width:150px; }}
+.metric .label {{ font-size:12px; color:#6B7280; }}
+.metric .value {{ font-size:20px; font-weight:600; }}
+table {{ border-collapse:collapse; width:100%; font-size:13px; background:white; }}
+th, td {{ border-bottom:1px solid #E5E7EB; padding:4px 8px; text-align:left; }}
+.ok {{ color:#059669; }} .bad {{ color:#DC2626; }}
+"""
+
+BRRRR_ROWS = [
+    ("Total Cash In", "total_cash_in", "$"),
+    ("Loan Amount", "loan_amount", "$"),
+    ("Cash Left In Deal", "cash_left_in", "$"),
+    ("NOI (annual)", "noi", "$"),
+    ("Cap Rate", "cap_rate", "%"),
+    ("Monthly Cashflow", "cashflow_monthly", "$"),
+    ("Annual Cashflow", "cashflow_annual", "$"),
+    ("CoC Return", "coc", "%"),
+    ("70% Rule Max Offer", "seventy_rule_max", "$"),
+    ("1% Rule Required Rent", "one_percent_required_rent", "$"),
+    ("1% Rule Ratio", "one_percent_ratio", "%"),
+    ("Monthly Mortgage Payment", "monthly_mortgage", "$"),
+    ("Annual Debt Service", "annual_debt_service", "$"),
+]
+
+
+def _fmt(value, kind: str = "$") -> str:
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return html.escape(str(value or "—"))
+    if kind == "%":
+        return f"{value:.1f}%"
+    return f"${value:,.0f}"
+
+
+def _input_hash(section: str, inputs: Any) -> str:
+    raw = json.dumps([TEMPLATE_VERSION, section, inputs], sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _touch(path: str):
+    """Mark a cache entry as used, so pruning keeps it."""
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+def _cached_section(section: str, inputs: Any, render) -> str:
+    """Return the section's HTML from the cache, rendering and storing it on a miss."""
+    path = os.path.join(CACHE_DIR, f"{_input_hash(section, inputs)}.html")
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            markup = f.read()
+        _touch(path)
+        return markup
+    except FileNotFoundError:
+        pass
+    markup = render(inputs)
+    try:
+        atomic_write(path, markup, fsync=False)
+    except OSError:
+        pass  # read-only disk – just don't cache
+    return markup
+
+
+# ----- SVG CHARTS --------------------------------------------------------
+def _svg_bars(items: List[Tuple[str, float]], color: str = PRIMARY_COLOR, width: int = 560) -> str:
+    """Horizontal bar chart as inline SVG."""
+    if not items:
+        return ""
+    bar_h, gap, label_w = 22, 8, 170
+    peak = max(abs(v) for _, v in items) or 1.0
+    height = len(items) * (bar_h + gap)
+    parts = [f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" role="img">']
+    for i, (label, value) in enumerate(items):
+        y = i * (bar_h + gap)
+        w = max(abs(value) / peak * (width - label_w - 90), 1)
+        fill = color if value >= 0 else "#DC2626"
+        parts.append(
+            f'<text x="0" y="{y + 15}" font-size="12">{html.escape(label)}</text>'
+            f'<rect x="{label_w}" y="{y}" width="{w:.1f}" height="{bar_h}" rx="4" fill="{fill}"/>'
+            f'<text x="{label_w + w + 6:.1f}" y="{y + 15}" font-size="12">{_fmt(value)}</text>'
+        )
+    parts.append("</svg>")
+    return "".join(parts)
+
+
+# ----- SECTIONS ----------------------------------------------------------
+def _section_header(inputs: Dict[str, Any]) -> str:
+    snap = inputs["snapshot"]
+    facts = " • ".join(
+        f"{label}: {html.escape(str(snap[key]))}"
+        for label, key in [("Beds", "beds"), ("Baths", "baths"), ("Sqft", "sqft"),
+                           ("Year", "year_built"), ("Type", "type"), ("MLS", "mls")]
+        if snap.get(key) not in (None, "", 0, 0.0)
+    )
+    return (
+        f"<h1>{html.escape(str(snap.get('address') or inputs['name']))}</h1>"
+        f"<div class='sub'>{facts}</div>"
+    )
+
+
+def _section_summary(brrrr: Dict[str, Any]) -> str:
+    notice = ""
+    if "loan_amount" not in brrrr:
+        notice = (
+            "<p class='bad'>No ARV provided – refi loan, cash left in, CoC, cashflow "
+            "and the 70% rule can't be computed and are left out.</p>"
+        )
+    cards = "".join(
+        f"<div class='metric'><div class='label'>{label}</div><div class='value'>{_fmt(brrrr.get(key), kind)}</div></div>"
+        for label, key, kind in [
+            ("Cash Left In Deal", "cash_left_in", "$"),
+            ("Monthly Cashflow", "cashflow_monthly", "$"),
+            ("CoC Return", "coc", "%"),
+            ("Cap Rate", "cap_rate", "%"),
+        ]
+    )
+    chart = _svg_bars([
+        (label, float(brrrr[key] or 0))
+        for label, key in [
+            ("Total Cash In", "total_cash_in"),
+            ("Refi Loan", "loan_amount"),
+            ("Cash Left In", "cash_left_in"),
+            ("NOI (annual)", "noi"),
+            ("Debt Service (annual)", "annual_debt_service"),
+        ]
+        if key in brrrr
+    ])
+    rows = "".join(
+        f"<tr><td>{label}</td><td>{_fmt(brrrr.get(key), kind)}</td></tr>"
+        for label, key, kind in BRRRR_ROWS if key in brrrr
+    )
+    return (
+        f"<div class='section'><h2>📊 BRRRR Summary</h2>{notice}"
+        f"<div class='metrics'>{cards}</div><p>{chart}</p>"
+        f"<table><tr><th>Metric</th><th>Value</th></tr>{rows}</table></div>"
+    )
+
+
+def _section_arv(inputs: Dict[str, Any]) -> str:
+    arv, comps = inputs["arv"], inputs["comps"]
+    chart = _svg_bars(
+        [(label, float(arv[key])) for label, key in
+         [("ARV Low", "arv_low"), ("ARV Median", "arv_median"), ("ARV Average", "arv_avg"), ("ARV High", "arv_high")]
+         if arv.get(key) is not None],
+        color=ACCENT_COLOR,
+    )
+    table = ""
+    if comps:
+        cols = [c for c in comps[0].keys()]
+        head = "".join(f"<th>{html.escape(str(c))}</th>" for c in cols)
+        body = "".join(
+            "<tr>" + "".join(f"<td>{html.escape(str(row.get(c, '')))}</td>" for c in cols) + "</tr>"
+            for row in comps
+        )
+        table = f"<h2>📋 Comps Used</h2><table><tr>{head}</tr>{body}</table>"
+    return f"<div class='section'><h2>🏁 ARV Estimates</h2><p>{chart}</p>{table}</div>"
+
+
+def _section_financing(products: List[Dict[str, Any]]) -> str:
+    rows = "".join(
+        "<tr>"
+        f"<td>{html.escape(str(p.get('name', '')))}</td>"
+        f"<td>{_fmt(p.get('cash_left_in'))}</td>"
+        f"<td>{_fmt(p.get('cashflow_monthly'))}</td>"
+        f"<td>{_fmt(p.get('coc'), '%')}</td>"
+        f"<td class='{'ok' if p.get('dscr_ok') else 'bad'}'>{float(p.get('dscr', 0)):.2f}</td>"
+        "</tr>"
+        for p in products
+    )
+    return (
+        "<div class='section'><h2>🏦 Financing Options</h2><table>"
+        "<tr><th>Product</th><th>Cash Left In</th><th>Monthly Cashflow</th><th>CoC</th><th>DSCR</th></tr>"
+        f"{rows}</table></div>"
+    )
+
+
+# ----- RENDERING ---------------------------------------------------------
+def _records(value) -> List[Dict[str, Any]]:
+    if value is None:
+        return []
+    if hasattr(value, "to_dict"):
+        return value.to_dict("records")
+    return list(value)
+
+
+def render_deal_report(deal: Dict[str, Any]) -> str:
+    """Render one deal as a self-contained HTML document."""
+    name = str(deal.get("name") or deal.get("snapshot", {}).get("address") or "deal")
+    snapshot = deal.get("snapshot") or {}
+    brrrr = deal.get("brrrr") or {}
+
+    sections = [_cached_section("header", {"name": name, "snapshot": snapshot}, _section_header)]
+    if brrrr:
+        sections.append(_cached_section("summary", brrrr, _section_summary))
+    if deal.get("arv") or deal.get("comps") is not None:
+        sections.append(_cached_section(
+            "arv", {"arv": deal.get("arv") or {}, "comps": _records(deal.get("comps"))}, _section_arv,
+        ))
+    if deal.get("financing") is not None:
+        sections.append(_cached_section("financing", _records(deal.get("financing")), _section_financing))
+
+    return (
+        "<!DOCTYPE html><html><head><meta charset='utf-8'>"
+        f"<title>{html.escape(name)} – BRRRR PRO</title><style>{_CSS}</style></head>"
+        f"<body>{''.join(sections)}"
+        "<p class='sub'>Generated by BRRRR PRO</p></body></html>"
+    )
+
+
+def html_to_pdf(markup: str) -> bytes:
+    """Convert report HTML to PDF. Needs the optional `weasyprint` package."""
+    try:
+        from weasyprint import HTML
+    except ImportError:
+        raise RuntimeError("PDF reports need weasyprint: pip install weasyprint") from None
+    return HTML(string=markup).write_pdf()
+
+
+def _report_filename(deal: Dict[str, Any], index: int, fmt: str) -> str:
+    base = str(deal.get("name") or deal.get("snapshot", {}).get("address") or f"deal_{index}")
+    safe = "".join(c if c.isalnum() or c in "-_" else "_" for c in base).strip("_") or f"deal_{index}"
+    return f"{index:04d}_{safe[:80]}.{fmt}"
+
+
+def _render_one(job: Tuple[int, Dict[str, Any], str]) -> Tuple[str, bytes]:
+    index, deal, fmt = job
+    markup = render_deal_report(deal)
+    if fmt == "html":
+        return _report_filename(deal, index, fmt), markup.encode("utf-8")
+
+    # PDF conversion is the slow part – cache the whole document by its HTML
+    path = os.path.join(CACHE_DIR, f"{_input_hash('pdf', markup)}.pdf")
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+        _touch(path)
+    except FileNotFoundError:
+        data = html_to_pdf(markup)
+        try:
+            atomic_write(path, data, fsync=False)
+        except OSError:
+            pass
+    return _report_filename(deal, index, fmt), data
+
+
+def prune_report_cache(max_files: Optional[int] = None) -> int:
+    """
+    Delete the least recently used cache entries beyond `max_files`
+    (default REPORT_CACHE_MAX_FILES); returns how many.
+    """
+    max_files = REPORT_CACHE_MAX_FILES if max_files is None else max_files
+    try:
+        with os.scandir(CACHE_DIR) as it:
+            entries = [(e.stat().st_mtime, e.path) for e in it if e.is_file() and not e.name.startswith(".")]
+    except FileNotFoundError:
+        return 0
+    entries.sort(reverse=True)
+    removed = 0
+    for _, path in entries[max_files:]:
+        try:
+            os.remove(path)
+            removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+def render_batch(
+    deals: List[Dict[str, Any]],
+    fmt: str = "html",
+    dest: Optional[str] = None,
+    max_workers: Optional[int] = None,
+) -> bytes:
+    """
+    Render every deal and pack the reports into one zip. PDFs are converted
+    in parallel worker processes (at most `max_workers`); HTML renders
+    sequentially by design (see the note at the top). Writes the zip to
+    `dest` when given; always returns its bytes.
+    """
+    if fmt not in ("html", "pdf"):
+        raise ValueError("fmt must be 'html' or 'pdf'")
+
+    jobs = [(i + 1, deal, fmt) for i, deal in enumerate(deals)]
+    if fmt == "pdf" and len(jobs) > 1:
+        workers = max_workers or os.cpu_count() or 1
+        # Spawned, not forked: a fork of the multithreaded Streamlit server
+        # can inherit locks (e.g. storage's) held by another thread
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            rendered = list(pool.map(_render_one, jobs, chunksize=max(1, len(jobs) // (workers * 4))))
+    else:
+        rendered = [_render_one(job) for job in jobs]
+    prune_report_cache()
+
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        index_rows = []
+        for (filename, data), (_, deal, _) in zip(rendered, jobs):
+            archive.writestr(filename, data)
+            brrrr = deal.get("brrrr") or {}
+            index_rows.append(
+                f"<tr><td><a href='{html.escape(filename)}'>{html.escape(filename)}</a></td>"
+                f"<td>{_fmt(brrrr.get('cash_left_in'))}</td><td>{_fmt(brrrr.get('coc'), '%')}</td></tr>"
+            )
+        archive.writestr(
+            "index.html",
+            "<!DOCTYPE html><html><head><meta charset='utf-8'><title>BRRRR PRO – Deal Packets</title>"
+            f"<style>{_CSS}</style></head><body><h1>Deal Packets</h1>"
+            "<table><tr><th>Report</th><th>Cash Left In</th><th>CoC</th></tr>"
+            f"{''.join(index_rows)}</table></body></html>",
+        )
+
+    blob = buffer.getvalue()
+    if dest:
+        atomic_write(dest, blob)
+    return blob
+
+
+def deals_from_snapshots(
+    names: List[str],
+    assumptions: Optional[Dict[str, Any]] = None,
+    arvs: Optional[Dict[str, float]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Build report inputs for saved snapshots, with BRRRR metrics computed in
+    one vectorized pass. Snapshots carry no ARV, so `arvs` maps snapshot
+    name -> ARV (e.g. from the ARV Analyzer); deals without one get only the
+    metrics that don't depend on it.
+    """
+    arvs = arvs or {}
+    found, table = load_snapshot_table(names, with_names=True)
+    if not found:
+        return []
+
+    # Straight from the decoded table – no per-snapshot load / dict round trip
+    frame = snapshot_frame(table)
+    snapshots = frame.to_dict("records")
+    frame["arv"] = [arvs.get(name) for name in found]
+    metrics = compute_brrrr_metrics(frame, assumptions)
+    metric_cols = [key for _, key, _ in BRRRR_ROWS]
+
+    deals = []
+    for name, snap, row in zip(found, snapshots, metrics[metric_cols].to_dict("records")):
+        deal = {
+            "name": name,
+            "snapshot": snap,
+            "brrrr": {key: value for key, value in row.items() if pd.notna(value)},
+        }
+        if arvs.get(name):
+            deal["arv"] = {"arv_median": float(arvs[name])}
+        deals.append(deal)
+    return deals
@@ -0,0 +1,241 @@
+from __future__ import annotations
+
+import json
+import math
+import struct
+from dataclasses import dataclass, asdict, fields
+from typing import Dict, Any, Iterable, Union
+
+from utils.lazy import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+# -------------------------------------------
+# 🔹 Typed property snapshot + compact binary format
+# -------------------------------------------
+# A snapshot is validated strictly once, when it is written; reading (binary
+# records or legacy JSON) never rejects a snapshot. On disk it's a fixed-size
+# little-endian record (see SNAPSHOT_FIELDS) behind a small header, so a file
+# holding one snapshot or thousands decodes with np.frombuffer – no parsing,
+# no per-field float() on the way back in. Bulk readers work on the decoded
+# table (see storage.load_snapshot_table / snapshot_frame).
+#
+#   header:  magic b"BRSN" | u16 schema version | u16 record size | u32 count | 4 pad
+#   body:    count * record
+
+MAGIC = b"BRSN"
+SCHEMA_VERSION = 2
+
+_HEADER = struct.Struct("<4sHHI4x")
+
+ADDRESS_BYTES = 120
+MLS_BYTES = 24
+TYPE_BYTES = 16
+
+# (field, numpy type) – order is the on-disk layout. Dollar amounts, areas and
+# ratios are f8 so saved values come back exactly as entered; beds / baths
+# (half steps) are exact in f4.
+SNAPSHOT_FIELDS = [
+    ("address", f"S{ADDRESS_BYTES}"),
+    ("mls", f"S{MLS_BYTES}"),
+    ("type", f"S{TYPE_BYTES}"),
+    ("beds", "<f4"),
+    ("baths", "<f4"),
+    ("sqft", "<f8"),
+    ("lot_size", "<f8"),
+    ("year_built", "<u2"),
+    ("list_price", "<f8"),
+    ("rent_est", "<f8"),
+    ("taxes_year", "<f8"),
+    ("price_per_sqft", "<f8"),
+    ("rent_to_price", "<f8"),
+]
+
+# Older layouts, still readable: version -> fields
+_LEGACY_FIELDS = {
+    1: [(name, "<f4" if name in ("sqft", "lot_size", "rent_est", "taxes_year",
+                                 "price_per_sqft", "rent_to_price") else kind)
+        for name, kind in SNAPSHOT_FIELDS],
+}
+
+_STRING_LIMITS = {"address": ADDRESS_BYTES, "mls": MLS_BYTES, "type": TYPE_BYTES}
+
+
+class SnapshotError(ValueError):
+    """Raised when a snapshot fails validation or a file isn't a valid snapshot file."""
+
+
+def snapshot_dtype(version: int = SCHEMA_VERSION):
+    """numpy structured dtype of one on-disk record."""
+    if version == SCHEMA_VERSION:
+        return np.dtype(SNAPSHOT_FIELDS)
+    return np.dtype(_LEGACY_FIELDS[version])
+
+
+@dataclass(slots=True)
+class PropertySnapshot:
+    address: str
+    mls: str = ""
+    type: str = "Single Family"
+    beds: float = 0.0
+    baths: float = 0.0
+    sqft: float = 0.0
+    lot_size: float = 0.0
+    year_built: int = 0  # 0 = unknown
+    list_price: float = 0.0
+    rent_est: float = 0.0
+    taxes_year: float = 0.0
+    price_per_sqft: float = 0.0
+    rent_to_price: float = 0.0
+
+    def validate(self) -> "PropertySnapshot":
+        """Raise SnapshotError if any field can't be stored; return self otherwise."""
+        if not self.address or not self.address.strip():
+            raise SnapshotError("Snapshot needs an address.")
+
+        for name, limit in _STRING_LIMITS.items():
+            value = getattr(self, name)
+            if not isinstance(value, str):
+                raise SnapshotError(f"{name} must be text, got {type(value).__name__}.")
+            if len(value.encode("utf-8")) > limit:
+                raise SnapshotError(f"{name} is longer than {limit} bytes.")
+
+        for f in fields(self):
+            if f.name in _STRING_LIMITS:
+                continue
+            value = getattr(self, f.name)
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise SnapshotError(f"{f.name} must be a number, got {type(value).__name__}.")
+            if not math.isfinite(value) or value < 0:
+                raise SnapshotError(f"{f.name} must be a finite, non-negative number.")
+
+        if self.year_built and not 1800 <= self.year_built <= 2100:
+            raise SnapshotError("year_built must be between 1800 and 2100 (or 0 if unknown).")
+        return self
+
+    # ----- conversions ---------------------------------------------------
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "PropertySnapshot":
+        """
+        Build from a dict (legacy JSON snapshot, watchlist update, API payload).
+        This is the one place loose values are coerced; unknown keys are
+        ignored and unparseable numbers become 0. Not validated – that happens
+        when the snapshot is written, so old files always load.
+        """
+        kwargs: Dict[str, Any] = {}
+        for f in fields(cls):
+            if f.name not in data:
+                continue
+            value = data[f.name]
+            if f.name in _STRING_LIMITS:
+                kwargs[f.name] = "" if value is None else str(value)
+                continue
+            try:
+                number = float(value or 0)
+            except (TypeError, ValueError):
+                number = 0.0
+            if not math.isfinite(number):
+                number = 0.0
+            kwargs[f.name] = int(number) if f.name == "year_built" else number
+        return cls(**kwargs)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    def to_json(self) -> str:
+        """JSON export (same keys as the original dict snapshots)."""
+        return json.dumps({"schema_version": SCHEMA_VERSION, **self.to_dict()}, indent=4)
+
+    @classmethod
+    def from_record(cls, record) -> "PropertySnapshot":
+        """Build from one row of a decoded snapshot table."""
+        values = {}
+        for name, _ in SNAPSHOT_FIELDS:
+            value = record[name]
+            if name in _STRING_LIMITS:
+                values[name] = value.decode("utf-8")
+            elif name == "year_built":
+                values[name] = int(value)
+            else:
+                values[name] = float(value)
+        return cls(**values)
+
+
+# ----- BINARY ENCODE / DECODE -------------------------------------------
+def _record_value(snap: PropertySnapshot, name: str):
+    value = getattr(snap, name)
+    if name in _STRING_LIMITS:
+        # Cut on a character boundary (only unvalidated legacy values are too long)
+        return value.encode("utf-8")[:_STRING_LIMITS[name]].decode("utf-8", "ignore").encode("utf-8")
+    if name == "year_built":
+        return min(max(int(value), 0), 0xFFFF)
+    return value
+
+
+def snapshot_table(snapshots: Iterable[PropertySnapshot]):
+    """
+    Snapshots as a structured array in the current record layout. Not
+    validated – used to bring legacy snapshots into a table; writes go
+    through pack_snapshots.
+    """
+    snapshots = list(snapshots)
+    table = np.zeros(len(snapshots), dtype=snapshot_dtype())
+    for i, snap in enumerate(snapshots):
+        table[i] = tuple(_record_value(snap, name) for name, _ in SNAPSHOT_FIELDS)
+    return table
+
+
+def pack_snapshots(snapshots: Iterable[PropertySnapshot]) -> bytes:
+    """Validate and encode snapshots into one binary blob (header + records)."""
+    table = snapshot_table(s.validate() for s in snapshots)
+    header = _HEADER.pack(MAGIC, SCHEMA_VERSION, table.dtype.itemsize, len(table))
+    return header + table.tobytes()
+
+
+def _check_header(header, total_size: int):
+    """Return (record dtype, count) for a snapshot file's header."""
+    if total_size < _HEADER.size or len(header) < _HEADER.size:
+        raise SnapshotError("Snapshot file is truncated.")
+    magic, version, record_size, count = _HEADER.unpack_from(header, 0)
+    if magic != MAGIC:
+        raise SnapshotError("Not a snapshot file.")
+    if version != SCHEMA_VERSION and version not in _LEGACY_FIELDS:
+        raise SnapshotError(f"Unsupported snapshot schema version {version}.")
+    dtype = snapshot_dtype(version)
+    if record_size != dtype.itemsize:
+        raise SnapshotError(f"Unexpected record size {record_size} for schema version {version}.")
+    if total_size < _HEADER.size + count * record_size:
+        raise SnapshotError("Snapshot file is truncated.")
+    return dtype, count
+
+
+def unpack_snapshots(buffer: Union[bytes, memoryview]):
+    """
+    Zero-copy decode: returns a read-only numpy structured array that views
+    `buffer` directly. Filter it with normal numpy masks, e.g.
+    table[table["list_price"] < 100_000]. Files in an older layout are
+    converted (copied) to the current dtype.
+    """
+    dtype, count = _check_header(buffer, len(buffer))
+    table = np.frombuffer(buffer, dtype=dtype, count=count, offset=_HEADER.size)
+    return table if dtype == snapshot_dtype() else table.astype(snapshot_dtype())
+
+
+def snapshot_frame(table) -> pd.DataFrame:
+    """
+    DataFrame with one column per snapshot field, built column-wise from a
+    decoded table (text fields decoded in one vectorized pass each).
+    """
+    return pd.DataFrame({
+        name: np.char.decode(table[name], "utf-8", "ignore") if name in _STRING_LIMITS else table[name]
+        for name, _ in SNAPSHOT_FIELDS
+    })
+
+
+def decode_snapshot(buffer: Union[bytes, memoryview]) -> PropertySnapshot:
+    """Decode a single-snapshot blob."""
+    table = unpack_snapshots(buffer)
+    if len(table) != 1:
+        raise SnapshotError(f"Expected one snapshot, found {len(table)}.")
+    return PropertySnapshot.from_record(table[0])
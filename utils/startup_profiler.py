@@ -0,0 +1,128 @@
+import os
+import re
+import sys
+import json
+import argparse
+import subprocess
+from typing import Dict, Any, List
+
+# -------------------------------------------
+# 🔹 Startup profiler
+# -------------------------------------------
+# Runs each page in a fresh interpreter (a cold start, like a new container)
+# and reports:
+#   - import time: everything the page imports itself, measured with -X importtime
+#   - first render: wall time of the first full script run under AppTest
+#   - which heavy modules got loaded on that first render, and what the
+#     lazy placeholders in utils.lazy spent importing them (IMPORT_TIMINGS)
+#
+# A page that raises during its first render is reported as an error: its
+# timings describe a crashed run, not the page.
+#
+#   python -m utils.startup_profiler            # all pages
+#   python -m utils.startup_profiler app.py --json
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ["pandas", "numpy", "PIL", "requests", "openai"]
+
+_MARKER = "@@brrrr-profile-start@@"
+
+# Runs inside the child interpreter. Streamlit + AppTest are warmed up before
+# the marker so their own imports aren't charged to the page.
+_CHILD = """
+import sys, time, json
+sys.path.insert(0, {root!r})
+from streamlit.testing.v1 import AppTest
+AppTest.from_string("import streamlit as st").run()
+sys.stderr.write({marker!r} + "\\n")
+sys.stderr.flush()
+at = AppTest.from_file({path!r}, default_timeout=120)
+start = time.perf_counter()
+at.run()
+elapsed = time.perf_counter() - start
+from utils.lazy import IMPORT_TIMINGS
+print(json.dumps({{
+    "first_render_ms": elapsed * 1000,
+    "exceptions": [e.message for e in at.exception],
+    "loaded": [m for m in {heavy!r} if m in sys.modules],
+    "lazy_import_ms": {{m: round(s * 1000, 1) for m, s in IMPORT_TIMINGS.items()}},
+}}))
+"""
+
+_IMPORT_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( +)(\S+)$")
+
+
+def default_pages() -> List[str]:
+    pages_dir = os.path.join(ROOT, "pages")
+    pages = sorted(os.path.join("pages", p) for p in os.listdir(pages_dir) if p.endswith(".py"))
+    return ["app.py"] + pages
+
+
+def _parse_importtime(stderr: str) -> Dict[str, float]:
+    """Top-level cumulative import times (ms) recorded after the marker."""
+    times: Dict[str, float] = {}
+    started = False
+    for line in stderr.splitlines():
+        if line.strip() == _MARKER:
+            started = True
+            continue
+        if not started:
+            continue
+        match = _IMPORT_LINE.match(line)
+        # One space of indent = imported directly, not as a dependency of another import
+        if match and len(match.group(3)) == 1:
+            times[match.group(4)] = times.get(match.group(4), 0.0) + int(match.group(2)) / 1000.0
+    return times
+
+
+def profile_page(path: str) -> Dict[str, Any]:
+    """Cold-start one page in a child interpreter and return its timings."""
+    code = _CHILD.format(root=ROOT, marker=_MARKER, path=os.path.join(ROOT, path), heavy=HEAVY_MODULES)
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+    )
+
+    if proc.returncode != 0 or not proc.stdout.strip():
+        return {"page": path, "error": proc.stderr.strip().splitlines()[-1:] or ["unknown error"]}
+
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    if result["exceptions"]:
+        return {"page": path, "error": result["exceptions"]}
+
+    imports = _parse_importtime(proc.stderr)
+    result.update({
+        "page": path,
+        "import_ms": sum(imports.values()),
+        "heavy_import_ms": {m: round(imports[m], 1) for m in HEAVY_MODULES if m in imports},
+    })
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cold-start import and first-render timings per page.")
+    parser.add_argument("pages", nargs="*", help="scripts relative to the repo root (default: all pages)")
+    parser.add_argument("--json", action="store_true", help="print raw JSON instead of a table")
+    args = parser.parse_args(argv)
+
+    results = [profile_page(p) for p in (args.pages or default_pages())]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'page':<32} {'imports ms':>11} {'first render ms':>16}  heavy modules loaded")
+    for r in results:
+        if "error" in r:
+            print(f"{r['page']:<32} ERROR: {r['error'][0]}")
+            continue
+        timings = {**r["lazy_import_ms"], **r["heavy_import_ms"]}
+        heavy = ", ".join(f"{m} {timings[m]:.0f}ms" if m in timings else m for m in r["loaded"]) or "-"
+        print(f"{r['page']:<32} {r['import_ms']:>11.0f} {r['first_render_ms']:>16.0f}  {heavy}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,37 +1,415 @@
 import os
+import re
 import json
+import errno
+import time
+import queue
+import atexit
+import tempfile
+import threading
+from concurrent.futures import Future
+
+from utils.lazy import lazy_import
+from utils.snapshot_schema import (
+    PropertySnapshot,
+    SnapshotError,
+    decode_snapshot,
+    pack_snapshots,
+    snapshot_dtype,
+    snapshot_table,
+    unpack_snapshots,
+)
+
+np = lazy_import("numpy")
 
 DATA_DIR = "data"
+EXPORT_DIR = os.path.join(DATA_DIR, "exports")
 
-def save_property_snapshot(filename, data):
-    os.makedirs(DATA_DIR, exist_ok=True)
-    path = os.path.join(DATA_DIR, f"{filename}.json")
-    with open(path, "w") as f:
-        json.dump(data, f, indent=4)
-    return f"{filename}.json"
+# Snapshots are stored as typed binary records (.snap). Older snapshots saved
+# as plain JSON dicts (.json) are still listed and loaded.
+SNAP_EXT = ".snap"
+LEGACY_EXT = ".json"
 
-def list_snapshots():
-    """Return list of snapshot filenames (without .json extension)."""
+
+def _snapshot_files():
     if not os.path.exists(DATA_DIR):
         return []
-    files = [f.replace(".json", "") for f in os.listdir(DATA_DIR) if f.endswith(".json")]
-    return sorted(files)
+    return [f for f in os.listdir(DATA_DIR) if f.endswith((SNAP_EXT, LEGACY_EXT))]
 
-def load_snapshot(filename):
-    """Load a snapshot file by name (without .json extension)."""
-    path = os.path.join(DATA_DIR, f"{filename}.json")
-    if not os.path.exists(path):
+
+# ----- WRITES ------------------------------------------------------------
+# Several analysts share one deployment, so snapshot writes must never leave
+# a half-written file behind. Every write goes to a temp file in the same
+# folder and is os.replace()d into place, so readers see either the old or
+# the new snapshot and never take a lock.
+#
+# save_property_snapshot() validates and encodes on the caller's thread, then
+# hands the bytes to one background writer. The writer drains the queue in
+# batches: repeated saves of the same key collapse into the last one, data
+# fsyncs run back to back, and the folder is fsynced once per batch.
+#
+# Each snapshot in a batch commits on its own, so one that can't be written
+# doesn't hold up the rest. A failed snapshot (disk full, permissions) is
+# never dropped: it stays pending – still visible to loaders – and is retried
+# on the next save or flush, up to WRITE_ATTEMPTS_MAX times; errors that can't
+# go away on a retry (e.g. name too long) are not retried. Saving the key
+# again starts over. snapshot_write_errors() reports them until a write
+# succeeds.
+
+BATCH_MAX = 256
+BATCH_WINDOW_SECONDS = 0.005
+WRITE_ATTEMPTS_MAX = 3
+
+# Retrying these can't help – the same write fails the same way
+_PERMANENT_ERRNOS = {errno.ENAMETOOLONG, errno.EINVAL, errno.EISDIR, errno.ENOTDIR, errno.EILSEQ}
+
+# Room for SNAP_EXT within the usual 255-byte file name limit
+NAME_MAX_BYTES = 200
+
+_key_locks = {}
+_key_locks_guard = threading.Lock()
+
+# filename -> encoded snapshot not yet on disk (read-your-writes for loaders)
+_pending = {}
+
+# filename -> exception from its last failed write (still in _pending)
+_failed = {}
+
+# filename -> failed writes of its current pending snapshot
+_attempts = {}
+
+
+def _key_lock(key):
+    with _key_locks_guard:
+        lock = _key_locks.get(key)
+        if lock is None:
+            lock = _key_locks[key] = threading.Lock()
+        return lock
+
+
+def _fsync_dir(path):
+    if not hasattr(os, "O_DIRECTORY"):
+        return  # Windows: directories can't be opened for fsync
+    fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _write_temp(path, blob):
+    """Write `blob` next to `path` and return the open temp file's (fd, name)."""
+    folder = os.path.dirname(path) or "."
+    fd, tmp = tempfile.mkstemp(dir=folder, prefix=".", suffix=".tmp")
+    try:
+        os.write(fd, blob)
+    except BaseException:
+        os.close(fd)
+        os.remove(tmp)
+        raise
+    return fd, tmp
+
+
+def atomic_write(path, data, fsync=True):
+    """Replace `path` with `data` (bytes or str) atomically, under its key lock."""
+    blob = data.encode("utf-8") if isinstance(data, str) else data
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with _key_lock(path):
+        fd, tmp = _write_temp(path, blob)
+        try:
+            if fsync:
+                os.fsync(fd)
+        finally:
+            os.close(fd)
+        os.replace(tmp, path)
+    if fsync:
+        _fsync_dir(os.path.dirname(path) or ".")
+
+
+def snapshot_name(text):
+    """Snapshot name for free text such as an address: spaces and path characters become "_"."""
+    name = re.sub(r"[^\w.,#'-]+", "_", text.strip()).lstrip(".")
+    return name.encode("utf-8")[:NAME_MAX_BYTES].decode("utf-8", "ignore")
+
+
+def _check_name(filename):
+    """Reject names that can't be a file in DATA_DIR (before they're queued)."""
+    if not isinstance(filename, str) or not filename:
+        raise SnapshotError("snapshot name must be a non-empty string")
+    if any(c in filename for c in ("/", "\\", "\0")) or filename.startswith("."):
+        raise SnapshotError(f"invalid snapshot name {filename!r}: no path separators or leading '.'")
+    if len(filename.encode("utf-8")) > NAME_MAX_BYTES:
+        raise SnapshotError(f"snapshot name longer than {NAME_MAX_BYTES} bytes")
+
+
+def _retryable(filename):
+    error = _failed[filename]
+    if getattr(error, "errno", None) in _PERMANENT_ERRNOS:
+        return False
+    return _attempts.get(filename, 0) < WRITE_ATTEMPTS_MAX
+
+
+class _SnapshotWriter(threading.Thread):
+    """Single background thread that commits queued snapshot writes in batches."""
+
+    def __init__(self):
+        super().__init__(name="snapshot-writer", daemon=True)
+        self.queue = queue.Queue()
+
+    def submit(self, filename, blob):
+        future = Future()
+        self.queue.put((filename, blob, future))
+        return future
+
+    def _drain(self):
+        batch = [self.queue.get()]
+        deadline = time.monotonic() + BATCH_WINDOW_SECONDS
+        while len(batch) < BATCH_MAX:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def run(self):
+        while True:
+            batch = self._drain()
+
+            # Last write per key wins; every caller's future resolves with it
+            latest = {}
+            futures = {}
+            for filename, blob, future in batch:
+                latest[filename] = blob
+                futures.setdefault(filename, []).append(future)
+
+            try:
+                errors = _commit(latest)
+            except Exception as e:
+                # Nothing in the batch could be committed (e.g. DATA_DIR unusable)
+                errors = dict.fromkeys(latest, e)
+
+            with _key_locks_guard:
+                for filename, blob in latest.items():
+                    if filename in errors:
+                        # Keep the snapshot pending so nothing is lost; retried on the next save / flush
+                        _failed[filename] = errors[filename]
+                        _attempts[filename] = _attempts.get(filename, 0) + 1
+                    else:
+                        _failed.pop(filename, None)
+                        _attempts.pop(filename, None)
+                        if _pending.get(filename) is blob:
+                            del _pending[filename]
+
+            for filename, waiting in futures.items():
+                for future in waiting:
+                    if filename in errors:
+                        future.set_exception(errors[filename])
+                    else:
+                        future.set_result(f"{filename}{SNAP_EXT}")
+            for _ in batch:
+                self.queue.task_done()
+
+
+def _commit(latest):
+    """
+    Write one batch: temp files, fsyncs, renames, one folder fsync. Each
+    snapshot succeeds or fails on its own; returns {filename: exception} for
+    the ones that failed.
+    """
+    os.makedirs(DATA_DIR, exist_ok=True)
+    errors = {}
+    staged = []
+    try:
+        for filename, blob in latest.items():
+            path = os.path.join(DATA_DIR, f"{filename}{SNAP_EXT}")
+            try:
+                fd, tmp = _write_temp(path, blob)
+            except OSError as e:
+                errors[filename] = e
+                continue
+            staged.append([filename, path, fd, tmp])
+
+        for item in staged:
+            filename, _, fd, _ = item
+            try:
+                os.fsync(fd)
+            except OSError as e:
+                errors[filename] = e
+            finally:
+                os.close(fd)
+                item[2] = None
+
+        for filename, path, _, tmp in staged:
+            if filename in errors:
+                continue
+            try:
+                with _key_lock(path):
+                    os.replace(tmp, path)
+                # The binary record replaces an older JSON snapshot of the same name
+                try:
+                    os.remove(os.path.join(DATA_DIR, f"{filename}{LEGACY_EXT}"))
+                except FileNotFoundError:
+                    pass
+            except OSError as e:
+                errors[filename] = e
+    finally:
+        for _, _, fd, tmp in staged:
+            if fd is not None:
+                os.close(fd)
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    _fsync_dir(DATA_DIR)
+    return errors
+
+
+_writer = None
+_writer_guard = threading.Lock()
+
+
+def _get_writer():
+    global _writer
+    with _writer_guard:
+        if _writer is None or not _writer.is_alive():
+            _writer = _SnapshotWriter()
+            _writer.start()
+            atexit.register(flush_snapshot_writes)
+        return _writer
+
+
+def _retry_failed(writer):
+    """Re-queue snapshots whose last write failed and may still succeed."""
+    with _key_locks_guard:
+        for name in _failed:
+            if name in _pending and _retryable(name):
+                writer.submit(name, _pending[name])
+
+
+def save_property_snapshot(filename, data, wait=False):
+    """
+    Validate and save a snapshot (PropertySnapshot or dict) as a binary record.
+    Raises SnapshotError right away if the data doesn't fit the schema or
+    `filename` isn't a usable name (see snapshot_name()).
+
+    The write itself is queued on the background writer. Loaders already see
+    the new snapshot; pass wait=True to block until it is durable on disk
+    (and get the OSError if it can't be written). Without wait, check
+    snapshot_write_errors() for writes that failed in the background.
+    """
+    _check_name(filename)
+    snapshot = data if isinstance(data, PropertySnapshot) else PropertySnapshot.from_dict(data)
+    blob = pack_snapshots([snapshot])
+
+    writer = _get_writer()
+    _retry_failed(writer)
+    # Queue order must match _pending order, or a stale blob could land last
+    with _key_locks_guard:
+        _pending[filename] = blob
+        _attempts.pop(filename, None)
+        future = writer.submit(filename, blob)
+    if wait:
+        return future.result()
+    return f"{filename}{SNAP_EXT}"
+
+
+def snapshot_write_errors():
+    """{snapshot name: error message} for snapshots that are not on disk yet because their write failed."""
+    with _key_locks_guard:
+        return {name: str(e) for name, e in _failed.items()}
+
+
+def flush_snapshot_writes():
+    """
+    Block until every queued snapshot write is done, retrying earlier
+    failures once (within WRITE_ATTEMPTS_MAX). Returns snapshot_write_errors() – empty when everything
+    is on disk.
+    """
+    if _writer is not None and _writer.is_alive():
+        _retry_failed(_writer)
+        _writer.queue.join()
+    return snapshot_write_errors()
+
+
+def export_snapshot_json(filename):
+    """Write a JSON copy of a snapshot to data/exports/ and return its path."""
+    snapshot = load_snapshot_record(filename)
+    if snapshot is None:
+        return None
+    path = os.path.join(EXPORT_DIR, f"{filename}.json")
+    atomic_write(path, snapshot.to_json())
+    return path
+
+
+def list_snapshots():
+    """Return list of snapshot names (without extension)."""
+    names = {os.path.splitext(f)[0] for f in _snapshot_files()}
+    return sorted(names | set(_pending))
+
+
+def _read_snapshot_bytes(filename):
+    """Newest encoded snapshot: a queued write if there is one, else the file."""
+    blob = _pending.get(filename)
+    if blob is not None:
+        return blob
+    try:
+        with open(os.path.join(DATA_DIR, f"{filename}{SNAP_EXT}"), "rb") as f:
+            return f.read()
+    except FileNotFoundError:
         return None
-    with open(path, "r") as f:
-        return json.load(f)
+
+
+def load_snapshot_record(filename):
+    """Load a snapshot by name as a PropertySnapshot (None if missing)."""
+    blob = _read_snapshot_bytes(filename)
+    if blob is not None:
+        return decode_snapshot(blob)
+
+    try:
+        with open(os.path.join(DATA_DIR, f"{filename}{LEGACY_EXT}"), "r") as f:
+            return PropertySnapshot.from_dict(json.load(f))
+    except FileNotFoundError:
+        # Possibly migrated to .snap between the two reads
+        blob = _read_snapshot_bytes(filename)
+        return decode_snapshot(blob) if blob is not None else None
+
+
+def load_snapshot(filename):
+    """Load a snapshot file by name (without extension) as a dict."""
+    snapshot = load_snapshot_record(filename)
+    return snapshot.to_dict() if snapshot is not None else None
+
 
 def load_last_snapshot():
     """Return the newest snapshot based on modification time."""
-    if not os.path.exists(DATA_DIR):
-        return None
-    files = [f for f in os.listdir(DATA_DIR) if f.endswith(".json")]
+    files = _snapshot_files()
     if not files:
         return None
     newest = max(files, key=lambda f: os.path.getmtime(os.path.join(DATA_DIR, f)))
-    with open(os.path.join(DATA_DIR, newest), "r") as f:
-        return json.load(f)
+    return load_snapshot(os.path.splitext(newest)[0])
+
+
+def load_snapshot_table(names=None, with_names=False):
+    """
+    Load many snapshots as one numpy structured array (fields as in
+    SNAPSHOT_FIELDS) without building per-snapshot Python objects. Legacy
+    JSON snapshots are converted on the fly. Missing names are skipped; with
+    `with_names=True` returns (names found, table), aligned row for row.
+    """
+    names = list_snapshots() if names is None else names
+    found, parts = [], []
+    for name in names:
+        blob = _read_snapshot_bytes(name)
+        if blob is not None:
+            part = unpack_snapshots(blob)
+        else:
+            record = load_snapshot_record(name)
+            if record is None:
+                continue
+            part = snapshot_table([record])
+        found.extend([name] * len(part))
+        parts.append(part)
+    table = np.concatenate(parts) if parts else np.zeros(0, dtype=snapshot_dtype())
+    return (found, table) if with_names else table
@@ -0,0 +1,312 @@
+from __future__ import annotations
+
+import os
+import json
+import time
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional
+
+from utils.lazy import lazy_import
+from utils.storage import DATA_DIR, atomic_write, flush_snapshot_writes, load_snapshot, save_property_snapshot
+from utils.snapshot_schema import SnapshotError
+from utils.zillow_scraper import get_property_data_conditional
+from utils.deal_rules import DEFAULT_RULES, compile_rules, screen_frame
+
+requests = lazy_import("requests")
+pd = lazy_import("pandas")
+
+# -------------------------------------------
+# 🔹 Watchlist – change detection + incremental re-evaluation
+# -------------------------------------------
+# Each watched property remembers its ETag / Last-Modified and a hash of the
+# fields we care about. A refresh:
+#   1. polls only properties that are due, with conditional requests (304 = done)
+#   2. hashes the fields that came back and skips properties whose hash didn't move
+#   3. re-runs the BRRRR metrics + buy-box rules for the changed ones only, in one
+#      vectorized pass
+#   4. appends a diff event per changed property to a local JSONL log
+#
+# Snapshots carry no ARV, so each entry keeps the ARV (and optionally rehab)
+# it should be judged against. Without one, ARV-based rules are "not
+# evaluable" and the entry's `passed` is None rather than False. Entries also
+# keep the rules and assumptions their baseline was judged with, so a refresh
+# compares like with like.
+#
+# A refresh can take a while; it only writes back the poll state of the
+# entries it polled, merged into a freshly loaded watchlist, so entries added
+# or removed meanwhile survive.
+
+# Kept in a sub-folder so list_snapshots() doesn't pick them up as snapshots
+WATCH_DIR = os.path.join(DATA_DIR, "watchlist")
+WATCHLIST_PATH = os.path.join(WATCH_DIR, "watchlist.json")
+EVENT_LOG_PATH = os.path.join(WATCH_DIR, "events.jsonl")
+
+# Remote field -> snapshot field
+WATCHED_FIELDS = {
+    "price": "list_price",
+    "rent_est": "rent_est",
+    "sqft": "sqft",
+}
+
+METRIC_FIELDS = ["coc", "cash_left_in", "cashflow_monthly", "cap_rate", "one_percent_ratio"]
+
+# Per-entry deal inputs passed to the rules alongside the snapshot fields
+ENTRY_INPUTS = ["arv", "rehab"]
+
+# Entry fields a refresh owns (everything else belongs to add / remove)
+POLL_STATE_FIELDS = ["last_checked", "next_check", "etag", "last_modified", "last_error", "content_hash", "passed"]
+
+# Serializes read-modify-write of watchlist.json within this process
+_watchlist_lock = threading.RLock()
+
+
+def _watched_value(value) -> Optional[float]:
+    """Dollars / sqft as compared and hashed: float, to the cent (1200 == 1200.0)."""
+    if value is None:
+        return None
+    try:
+        return round(float(value), 2)
+    except (TypeError, ValueError):
+        return None
+
+
+def _watched_values(record: Dict[str, Any]) -> Dict[str, Optional[float]]:
+    return {f: _watched_value(record.get(f)) for f in WATCHED_FIELDS.values()}
+
+
+def _content_hash(fields: Dict[str, Any]) -> str:
+    raw = json.dumps(fields, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(raw).hexdigest()
+
+
+def _verdict(result) -> Optional[bool]:
+    """True / False for a screened row, None when the rules couldn't be evaluated."""
+    return bool(result["passed"]) if bool(result["evaluable"]) else None
+
+
+def _rule_row(snap: Dict[str, Any], entry: Dict[str, Any]) -> Dict[str, Any]:
+    return {**snap, **{k: entry[k] for k in ENTRY_INPUTS if entry.get(k) is not None}}
+
+
+def load_watchlist() -> Dict[str, Dict[str, Any]]:
+    """Return {snapshot_name: watch entry}."""
+    if not os.path.exists(WATCHLIST_PATH):
+        return {}
+    with open(WATCHLIST_PATH, "r") as f:
+        return json.load(f)
+
+
+def save_watchlist(watchlist: Dict[str, Dict[str, Any]]):
+    atomic_write(WATCHLIST_PATH, json.dumps(watchlist, indent=4))
+
+
+def add_to_watchlist(
+    snapshot_name: str,
+    zpid: str,
+    poll_minutes: int = 60,
+    rules=None,
+    arv: Optional[float] = None,
+    rehab: Optional[float] = None,
+    assumptions: Optional[Dict[str, Any]] = None,
+):
+    """
+    Start watching a saved snapshot; `zpid` is the Zillow id used to poll it.
+    `arv` / `rehab` are the deal inputs the buy box is judged with – without
+    an ARV the default rules can't be evaluated. `rules` / `assumptions` are
+    stored with the entry and used for every later refresh.
+    """
+    snap = load_snapshot(snapshot_name) or {}
+    entry = {
+        "zpid": zpid,
+        "poll_minutes": poll_minutes,
+        "next_check": 0,
+        "etag": None,
+        "last_modified": None,
+        "arv": float(arv) if arv else None,
+        "rehab": float(rehab) if rehab is not None else None,
+        "rules": rules or DEFAULT_RULES,
+        "assumptions": assumptions or {},
+        "content_hash": _content_hash(_watched_values(snap)),
+    }
+    baseline = screen_frame(
+        pd.DataFrame([_rule_row(snap, entry)]), compile_rules(entry["rules"]), entry["assumptions"],
+        keep_failed=True,
+    )
+    entry["passed"] = _verdict(baseline.iloc[0])
+
+    with _watchlist_lock:
+        watchlist = load_watchlist()
+        watchlist[snapshot_name] = entry
+        save_watchlist(watchlist)
+
+
+def remove_from_watchlist(snapshot_name: str):
+    with _watchlist_lock:
+        watchlist = load_watchlist()
+        if watchlist.pop(snapshot_name, None) is not None:
+            save_watchlist(watchlist)
+
+
+def _merge_poll_state(polled: Dict[str, Dict[str, Any]]):
+    """Write the poll state of `polled` entries into the current watchlist."""
+    with _watchlist_lock:
+        watchlist = load_watchlist()
+        for name, entry in polled.items():
+            current = watchlist.get(name)
+            # Removed, or removed and re-added with another property, while polling
+            if current is None or current.get("zpid") != entry.get("zpid"):
+                continue
+            for field in POLL_STATE_FIELDS:
+                if field in entry:
+                    current[field] = entry[field]
+                else:
+                    current.pop(field, None)
+        save_watchlist(watchlist)
+
+
+def append_events(events: List[Dict[str, Any]]):
+    if not events:
+        return
+    os.makedirs(WATCH_DIR, exist_ok=True)
+    with open(EVENT_LOG_PATH, "a") as f:
+        for event in events:
+            f.write(json.dumps(event, default=str) + "\n")
+
+
+def read_events(limit: int = 200) -> List[Dict[str, Any]]:
+    """Newest-last list of the most recent watchlist events."""
+    if not os.path.exists(EVENT_LOG_PATH):
+        return []
+    with open(EVENT_LOG_PATH, "r") as f:
+        lines = f.readlines()[-limit:]
+    return [json.loads(line) for line in lines if line.strip()]
+
+
+# ----- REFRESH -----------------------------------------------------------
+def refresh_watchlist(
+    rules=None,
+    assumptions: Optional[Dict[str, Any]] = None,
+    max_workers: int = 16,
+    force: bool = False,
+    now: Optional[float] = None,
+) -> Dict[str, int]:
+    """
+    Poll every due property once and re-evaluate only the ones that changed.
+    Entries are judged with the rules / assumptions stored when they were
+    added; `rules` / `assumptions` only apply to entries saved without them.
+    Returns counters: due, not_modified, unchanged, changed, crossed, errors.
+    """
+    now = time.time() if now is None else now
+    watchlist = load_watchlist()
+
+    due = [name for name, w in watchlist.items() if force or w.get("next_check", 0) <= now]
+    stats = {"due": len(due), "not_modified": 0, "unchanged": 0, "changed": 0, "crossed": 0, "errors": 0}
+    if not due:
+        return stats
+
+    with requests.Session() as session, ThreadPoolExecutor(max_workers=max_workers) as pool:
+        responses = list(pool.map(
+            lambda name: get_property_data_conditional(
+                watchlist[name]["zpid"],
+                etag=watchlist[name].get("etag"),
+                last_modified=watchlist[name].get("last_modified"),
+                session=session,
+            ),
+            due,
+        ))
+
+    changed_rows = []
+    for name, resp in zip(due, responses):
+        entry = watchlist[name]
+        entry["last_checked"] = now
+        entry["next_check"] = now + entry.get("poll_minutes", 60) * 60
+
+        if resp["status"] == "error":
+            stats["errors"] += 1
+            entry["last_error"] = resp["data"].get("error")
+            continue
+
+        entry["etag"] = resp["etag"]
+        entry["last_modified"] = resp["last_modified"]
+        entry.pop("last_error", None)
+
+        if resp["status"] == "not_modified":
+            stats["not_modified"] += 1
+            continue
+
+        snap = load_snapshot(name) or {}
+        updated = dict(snap)
+        for remote, local in WATCHED_FIELDS.items():
+            value = resp["data"].get(remote)
+            if value is not None:
+                updated[local] = value
+
+        before, after = _watched_values(snap), _watched_values(updated)
+        new_hash = _content_hash(after)
+        if new_hash == entry.get("content_hash"):
+            stats["unchanged"] += 1
+            continue
+
+        entry["content_hash"] = new_hash
+        changes = {f: [before[f], after[f]] for f in after if before[f] != after[f]}
+        changed_rows.append((name, updated, changes))
+
+    # One vectorized pass per distinct (rules, assumptions) – usually just one
+    groups: Dict[str, Any] = {}
+    for item in changed_rows:
+        entry = watchlist[item[0]]
+        judged_by = (entry.get("rules") or rules or DEFAULT_RULES,
+                     entry["assumptions"] if "assumptions" in entry else assumptions)
+        groups.setdefault(json.dumps(judged_by, sort_keys=True), (judged_by, []))[1].append(item)
+
+    events = []
+    stats["changed"] = len(changed_rows)
+    for (group_rules, group_assumptions), items in groups.values():
+        frame = pd.DataFrame([_rule_row(row, watchlist[name]) for name, row, _ in items])
+        evaluated = screen_frame(frame, compile_rules(group_rules), group_assumptions, keep_failed=True)
+
+        for (name, updated, changes), (_, result) in zip(items, evaluated.iterrows()):
+            entry = watchlist[name]
+            passed = _verdict(result)
+            # Only a verdict flip counts; gaining or losing evaluability doesn't
+            crossed = entry.get("passed") is not None and passed is not None and entry["passed"] != passed
+            if crossed:
+                stats["crossed"] += 1
+            entry["passed"] = passed
+
+            try:
+                save_property_snapshot(name, updated)
+            except SnapshotError as e:
+                # e.g. a legacy snapshot that loads but no longer passes validation
+                entry["last_error"] = str(e)
+            events.append({
+                "ts": now,
+                "snapshot": name,
+                "changes": changes,
+                "metrics": {m: None if pd.isna(result[m]) else float(result[m]) for m in METRIC_FIELDS},
+                "passed": passed,
+                "crossed": ("entered" if passed else "left") if crossed else None,
+                "reasons": result["reasons"],
+            })
+
+    # Snapshot writes run in the background – surface any that didn't land
+    for name, error in flush_snapshot_writes().items():
+        if name in watchlist:
+            watchlist[name]["last_error"] = error
+
+    append_events(events)
+    _merge_poll_state({name: watchlist[name] for name in due})
+    return stats
+
+
+def run_watchlist(interval_seconds: int = 300, rules=None, assumptions: Optional[Dict[str, Any]] = None):
+    """Blocking scheduler loop: refresh whatever is due every `interval_seconds`."""
+    while True:
+        refresh_watchlist(rules=rules, assumptions=assumptions)
+        time.sleep(interval_seconds)
+
+
+if __name__ == "__main__":
+    run_watchlist()
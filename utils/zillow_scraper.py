@@ -1,39 +1,83 @@
-import requests
 import json
 
+from utils.lazy import lazy_import
+
+requests = lazy_import("requests")
+
 # -------------------------------------------
 # 🔹 Zillow Scraper (Unofficial Free API)
 # -------------------------------------------
 
+HEADERS = {
+    "User-Agent": "Mozilla/5.0",
+    "Accept": "application/json",
+}
+
+
+def _property_url(zpid: str) -> str:
+    return f"https://zillow.com/graphql/?zpid={zpid}"
+
+
+def _extract_fields(data: dict) -> dict:
+    # Extract important fields (fallback to None if missing)
+    return {
+        "price": data.get("price", None),
+        "sqft": data.get("livingArea", None),
+        "address": data.get("address", None),
+        "rent_est": data.get("rentZestimate", None),
+    }
+
+
 def get_property_data(zpid: str):
     """
     Fetches basic Zillow property info using an unofficial free endpoint.
     Requires the Zillow property zpid (from the URL).
     """
 
-    url = f"https://zillow.com/graphql/?zpid={zpid}"
-
-    headers = {
-        "User-Agent": "Mozilla/5.0",
-        "Accept": "application/json",
-    }
+    url = _property_url(zpid)
 
     try:
-        response = requests.get(url, headers=headers)
+        response = requests.get(url, headers=HEADERS)
         response.raise_for_status()
 
         data = response.json()
 
-        # Extract important fields (fallback to None if missing)
-        price = data.get("price", None)
-        sqft = data.get("livingArea", None)
-        address = data.get("address", None)
+        return _extract_fields(data)
+
+    except Exception as e:
+        return {"error": str(e)}
+
+
+def get_property_data_conditional(zpid: str, etag: str = None, last_modified: str = None, session=None):
+    """
+    Same as get_property_data, but sends If-None-Match / If-Modified-Since
+    so an unchanged listing costs a 304 instead of a full body.
+
+    Returns {"status": "ok" | "not_modified" | "error", "data", "etag", "last_modified"}.
+    """
+
+    headers = dict(HEADERS)
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+
+    http = session or requests
+
+    try:
+        response = http.get(_property_url(zpid), headers=headers, timeout=20)
+
+        if response.status_code == 304:
+            return {"status": "not_modified", "data": None, "etag": etag, "last_modified": last_modified}
+
+        response.raise_for_status()
 
         return {
-            "price": price,
-            "sqft": sqft,
-            "address": address,
+            "status": "ok",
+            "data": _extract_fields(response.json()),
+            "etag": response.headers.get("ETag", etag),
+            "last_modified": response.headers.get("Last-Modified", last_modified),
         }
 
     except Exception as e:
-        return {"error": str(e)}
+        return {"status": "error", "data": {"error": str(e)}, "etag": etag, "last_modified": last_modified}